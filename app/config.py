@@ -1,23 +1,79 @@
 ﻿import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
+from zoneinfo import ZoneInfo
 
-import pytz
 from dotenv import load_dotenv
 
+try:
+    from ._env_compiled import ENV as _COMPILED_ENV
+except ImportError:  # pragma: no cover - generated by scripts/compile_env.py
+    _COMPILED_ENV = None
+
 ALLOWED_CAMERA_SOURCES = {"windows-host", "http", "rtsp"}
+_TRUE_VALUES = frozenset({"1", "true", "yes", "y", "on"})
 SCHEMA_VERSION = "1.0.0"
+_SETTINGS_ENV_KEYS = (
+    "GROQ_API_KEY",
+    "GOOGLE_API_KEY",
+    "API_KEY",
+    "TIMEZONE",
+    "GROQ_MODEL",
+    "GOOGLE_MODEL",
+    "CAPTURE_INTERVAL_MIN",
+    "DATA_DIR",
+    "RETENTION_DAYS",
+    "RETENTION_MIN_SNAPSHOTS",
+    "RETENTION_USE_FILENAME_TIME",
+    "CAMERA_SOURCE",
+    "CAMERA_HTTP_URL",
+    "CAMERA_RTSP_URL",
+    "SNAPSHOT_WIDTH",
+    "SNAPSHOT_QUALITY",
+    "CAPTURE_DEVICE_NAME",
+    "FFMPEG_PATH",
+    "CAPTURE_OUTPUT_DIR",
+    "MAX_FILE_SIZE_MB",
+    "IMAGE_MIN_WIDTH",
+    "IMAGE_MIN_HEIGHT",
+    "IMAGE_MAX_WIDTH",
+    "IMAGE_MAX_HEIGHT",
+    "MOTION_DETECTION_ENABLED",
+    "MOTION_DETECTION_THRESHOLD",
+    "COMPARE_PHASH_THRESHOLD",
+    "DARK_FRAME_CHECK",
+    "TAGGING_ENABLED",
+    "ASK_ENABLED",
+    "ASK_LOOKBACK_HOURS",
+    "ASK_MAX_ITEMS",
+    "PREVIEW_COOLDOWN_SEC",
+    "UI_REFRESH_INTERVAL_SEC",
+    "WATCH_POLL_INTERVAL_SEC",
+    "LOG_LEVEL",
+    "GROQ_RATE_LIMIT_RPM",
+    "GEMINI_RATE_LIMIT_RPM",
+    "API_RETRY_MAX_ATTEMPTS",
+    "API_RETRY_BASE_DELAY",
+    "API_CIRCUIT_BREAKER_THRESHOLD",
+    "GROQ_COST_PER_MILLION_INPUT",
+    "GROQ_COST_PER_MILLION_OUTPUT",
+    "GEMINI_COST_PER_MILLION_INPUT",
+    "GEMINI_COST_PER_MILLION_OUTPUT",
+)
+_dotenv_loaded = False
+_ensured_data_dirs: set[Path] = set()
 
 
 def _parse_bool(value: Optional[str], default: bool = False) -> bool:
     if value is None:
         return default
-    return value.strip().lower() in {"1", "true", "yes", "y", "on"}
+    return value.strip().lower() in _TRUE_VALUES
 
 
 def _parse_int(value: Optional[str], default: int) -> int:
-    if value is None or value == "":
+    if not value:
         return default
     try:
         return int(value)
@@ -25,7 +81,7 @@ def _parse_int(value: Optional[str], default: int) -> int:
         return default
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Settings:
     groq_api_key: str
     google_api_key: str
@@ -33,11 +89,12 @@ class Settings:
     groq_model: str
     google_model: str
     timezone: str
-    tz: pytz.BaseTzInfo
+    tz: ZoneInfo
     capture_interval_min: int
     data_dir: Path
     retention_days: int
     retention_min_snapshots: int
+    retention_use_filename_time: bool
     camera_source: str
     camera_http_url: str
     camera_rtsp_url: str
@@ -53,6 +110,7 @@ class Settings:
     image_max_height: int
     motion_detection_enabled: bool
     motion_detection_threshold: int
+    compare_phash_threshold: int
     dark_frame_check: bool
     tagging_enabled: bool
     ask_enabled: bool
@@ -60,6 +118,7 @@ class Settings:
     ask_max_items: int
     preview_cooldown_sec: int
     ui_refresh_interval_sec: int
+    watch_poll_interval_sec: int
     log_level: str
     groq_rate_limit_rpm: int
     gemini_rate_limit_rpm: int
@@ -105,59 +164,80 @@ class Settings:
 
 
 def load_settings() -> Settings:
-    load_dotenv(override=False)
+    global _dotenv_loaded
+    if _COMPILED_ENV is not None:
+        # Process environment still wins, matching load_dotenv(override=False).
+        return _load_settings_cached(
+            tuple(os.environ.get(name, _COMPILED_ENV.get(name)) for name in _SETTINGS_ENV_KEYS)
+        )
+    if not _dotenv_loaded:
+        load_dotenv(override=False)
+        _dotenv_loaded = True
+    return _load_settings_cached(tuple(os.environ.get(name) for name in _SETTINGS_ENV_KEYS))
+
+
+@lru_cache(maxsize=1)
+def _load_settings_cached(env_values: tuple[Optional[str], ...]) -> Settings:
+    env = {
+        name: value
+        for name, value in zip(_SETTINGS_ENV_KEYS, env_values)
+        if value is not None
+    }
 
-    groq_api_key = os.getenv("GROQ_API_KEY", "").strip()
-    google_api_key = os.getenv("GOOGLE_API_KEY", "").strip()
-    api_key = os.getenv("API_KEY", "").strip()
+    groq_api_key = env.get("GROQ_API_KEY", "").strip()
+    google_api_key = env.get("GOOGLE_API_KEY", "").strip()
+    api_key = env.get("API_KEY", "").strip()
 
-    timezone = os.getenv("TIMEZONE", "America/New_York")
-    tz = pytz.timezone(timezone)
+    timezone = env.get("TIMEZONE", "America/New_York")
+    tz = ZoneInfo(timezone)
 
     settings = Settings(
         groq_api_key=groq_api_key,
         google_api_key=google_api_key,
         api_key=api_key,
-        groq_model=os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct"),
-        google_model=os.getenv("GOOGLE_MODEL", "gemini-2.0-flash"),
+        groq_model=env.get("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct"),
+        google_model=env.get("GOOGLE_MODEL", "gemini-2.0-flash"),
         timezone=timezone,
         tz=tz,
-        capture_interval_min=_parse_int(os.getenv("CAPTURE_INTERVAL_MIN"), 10),
-        data_dir=Path(os.getenv("DATA_DIR", "/data")),
-        retention_days=_parse_int(os.getenv("RETENTION_DAYS"), 14),
-        retention_min_snapshots=_parse_int(os.getenv("RETENTION_MIN_SNAPSHOTS"), 10),
-        camera_source=os.getenv("CAMERA_SOURCE", "windows-host"),
-        camera_http_url=os.getenv("CAMERA_HTTP_URL", "").strip(),
-        camera_rtsp_url=os.getenv("CAMERA_RTSP_URL", "").strip(),
-        snapshot_width=_parse_int(os.getenv("SNAPSHOT_WIDTH"), 0) or None,
-        snapshot_quality=_parse_int(os.getenv("SNAPSHOT_QUALITY"), 85),
-        capture_device_name=os.getenv("CAPTURE_DEVICE_NAME", "USB Camera"),
-        ffmpeg_path=os.getenv("FFMPEG_PATH", ""),
-        capture_output_dir=os.getenv("CAPTURE_OUTPUT_DIR", "./data/snapshots"),
-        max_file_size_mb=_parse_int(os.getenv("MAX_FILE_SIZE_MB"), 10),
-        image_min_width=_parse_int(os.getenv("IMAGE_MIN_WIDTH"), 320),
-        image_min_height=_parse_int(os.getenv("IMAGE_MIN_HEIGHT"), 240),
-        image_max_width=_parse_int(os.getenv("IMAGE_MAX_WIDTH"), 4096),
-        image_max_height=_parse_int(os.getenv("IMAGE_MAX_HEIGHT"), 4096),
-        motion_detection_enabled=_parse_bool(os.getenv("MOTION_DETECTION_ENABLED"), False),
-        motion_detection_threshold=_parse_int(os.getenv("MOTION_DETECTION_THRESHOLD"), 5),
-        dark_frame_check=_parse_bool(os.getenv("DARK_FRAME_CHECK"), False),
-        tagging_enabled=_parse_bool(os.getenv("TAGGING_ENABLED"), True),
-        ask_enabled=_parse_bool(os.getenv("ASK_ENABLED"), True),
-        ask_lookback_hours=_parse_int(os.getenv("ASK_LOOKBACK_HOURS"), 24),
-        ask_max_items=_parse_int(os.getenv("ASK_MAX_ITEMS"), 40),
-        preview_cooldown_sec=_parse_int(os.getenv("PREVIEW_COOLDOWN_SEC"), 5),
-        ui_refresh_interval_sec=_parse_int(os.getenv("UI_REFRESH_INTERVAL_SEC"), 30),
-        log_level=os.getenv("LOG_LEVEL", "INFO"),
-        groq_rate_limit_rpm=_parse_int(os.getenv("GROQ_RATE_LIMIT_RPM"), 30),
-        gemini_rate_limit_rpm=_parse_int(os.getenv("GEMINI_RATE_LIMIT_RPM"), 15),
-        api_retry_max_attempts=_parse_int(os.getenv("API_RETRY_MAX_ATTEMPTS"), 3),
-        api_retry_base_delay=_parse_int(os.getenv("API_RETRY_BASE_DELAY"), 2),
-        api_circuit_breaker_threshold=_parse_int(os.getenv("API_CIRCUIT_BREAKER_THRESHOLD"), 5),
-        groq_cost_input_million=float(os.getenv("GROQ_COST_PER_MILLION_INPUT", "0") or 0),
-        groq_cost_output_million=float(os.getenv("GROQ_COST_PER_MILLION_OUTPUT", "0") or 0),
-        gemini_cost_input_million=float(os.getenv("GEMINI_COST_PER_MILLION_INPUT", "0") or 0),
-        gemini_cost_output_million=float(os.getenv("GEMINI_COST_PER_MILLION_OUTPUT", "0") or 0),
+        capture_interval_min=_parse_int(env.get("CAPTURE_INTERVAL_MIN"), 10),
+        data_dir=Path(env.get("DATA_DIR", "/data")),
+        retention_days=_parse_int(env.get("RETENTION_DAYS"), 14),
+        retention_min_snapshots=_parse_int(env.get("RETENTION_MIN_SNAPSHOTS"), 10),
+        retention_use_filename_time=_parse_bool(env.get("RETENTION_USE_FILENAME_TIME"), False),
+        camera_source=env.get("CAMERA_SOURCE", "windows-host"),
+        camera_http_url=env.get("CAMERA_HTTP_URL", "").strip(),
+        camera_rtsp_url=env.get("CAMERA_RTSP_URL", "").strip(),
+        snapshot_width=_parse_int(env.get("SNAPSHOT_WIDTH"), 0) or None,
+        snapshot_quality=_parse_int(env.get("SNAPSHOT_QUALITY"), 85),
+        capture_device_name=env.get("CAPTURE_DEVICE_NAME", "USB Camera"),
+        ffmpeg_path=env.get("FFMPEG_PATH", ""),
+        capture_output_dir=env.get("CAPTURE_OUTPUT_DIR", "./data/snapshots"),
+        max_file_size_mb=_parse_int(env.get("MAX_FILE_SIZE_MB"), 10),
+        image_min_width=_parse_int(env.get("IMAGE_MIN_WIDTH"), 320),
+        image_min_height=_parse_int(env.get("IMAGE_MIN_HEIGHT"), 240),
+        image_max_width=_parse_int(env.get("IMAGE_MAX_WIDTH"), 4096),
+        image_max_height=_parse_int(env.get("IMAGE_MAX_HEIGHT"), 4096),
+        motion_detection_enabled=_parse_bool(env.get("MOTION_DETECTION_ENABLED"), False),
+        motion_detection_threshold=_parse_int(env.get("MOTION_DETECTION_THRESHOLD"), 5),
+        compare_phash_threshold=_parse_int(env.get("COMPARE_PHASH_THRESHOLD"), 0),
+        dark_frame_check=_parse_bool(env.get("DARK_FRAME_CHECK"), False),
+        tagging_enabled=_parse_bool(env.get("TAGGING_ENABLED"), True),
+        ask_enabled=_parse_bool(env.get("ASK_ENABLED"), True),
+        ask_lookback_hours=_parse_int(env.get("ASK_LOOKBACK_HOURS"), 24),
+        ask_max_items=_parse_int(env.get("ASK_MAX_ITEMS"), 40),
+        preview_cooldown_sec=_parse_int(env.get("PREVIEW_COOLDOWN_SEC"), 5),
+        ui_refresh_interval_sec=_parse_int(env.get("UI_REFRESH_INTERVAL_SEC"), 30),
+        watch_poll_interval_sec=_parse_int(env.get("WATCH_POLL_INTERVAL_SEC"), 5),
+        log_level=env.get("LOG_LEVEL", "INFO"),
+        groq_rate_limit_rpm=_parse_int(env.get("GROQ_RATE_LIMIT_RPM"), 30),
+        gemini_rate_limit_rpm=_parse_int(env.get("GEMINI_RATE_LIMIT_RPM"), 15),
+        api_retry_max_attempts=_parse_int(env.get("API_RETRY_MAX_ATTEMPTS"), 3),
+        api_retry_base_delay=_parse_int(env.get("API_RETRY_BASE_DELAY"), 2),
+        api_circuit_breaker_threshold=_parse_int(env.get("API_CIRCUIT_BREAKER_THRESHOLD"), 5),
+        groq_cost_input_million=float(env.get("GROQ_COST_PER_MILLION_INPUT", "0") or 0),
+        groq_cost_output_million=float(env.get("GROQ_COST_PER_MILLION_OUTPUT", "0") or 0),
+        gemini_cost_input_million=float(env.get("GEMINI_COST_PER_MILLION_INPUT", "0") or 0),
+        gemini_cost_output_million=float(env.get("GEMINI_COST_PER_MILLION_OUTPUT", "0") or 0),
     )
 
     _validate_settings(settings)
@@ -187,12 +267,16 @@ def _validate_settings(settings: Settings) -> None:
         errors.append("SNAPSHOT_QUALITY must be 1-100")
     if settings.motion_detection_threshold < 0 or settings.motion_detection_threshold > 100:
         errors.append("MOTION_DETECTION_THRESHOLD must be 0-100")
+    if settings.compare_phash_threshold < 0 or settings.compare_phash_threshold > 64:
+        errors.append("COMPARE_PHASH_THRESHOLD must be 0-64")
     if settings.ask_lookback_hours <= 0:
         errors.append("ASK_LOOKBACK_HOURS must be > 0")
     if settings.ask_max_items <= 0:
         errors.append("ASK_MAX_ITEMS must be > 0")
     if settings.preview_cooldown_sec < 0:
         errors.append("PREVIEW_COOLDOWN_SEC must be >= 0")
+    if settings.watch_poll_interval_sec <= 0:
+        errors.append("WATCH_POLL_INTERVAL_SEC must be > 0")
     if settings.groq_cost_input_million < 0 or settings.groq_cost_output_million < 0:
         errors.append("GROQ cost values must be >= 0")
     if settings.gemini_cost_input_million < 0 or settings.gemini_cost_output_million < 0:
@@ -202,6 +286,8 @@ def _validate_settings(settings: Settings) -> None:
 
 
 def _ensure_dirs(settings: Settings) -> None:
+    if settings.data_dir in _ensured_data_dirs:
+        return
     for directory in [
         settings.data_dir,
         settings.snapshots_dir,
@@ -214,3 +300,4 @@ def _ensure_dirs(settings: Settings) -> None:
         settings.run_dir,
     ]:
         directory.mkdir(parents=True, exist_ok=True)
+    _ensured_data_dirs.add(settings.data_dir)
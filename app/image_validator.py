@@ -1,36 +1,139 @@
-﻿from pathlib import Path
+﻿from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 
-from PIL import Image, ImageChops, ImageStat
+import numpy as np
+from PIL import Image
 
+# Per-pixel channel delta above which a pixel counts as changed.
+DIFF_PIXEL_THRESHOLD = 25
+DARK_FRAME_SAMPLE_SIZE = (64, 64)
+# Difference hash: 9x8 greyscale thumbnail, one bit per horizontal gradient.
+DHASH_SIZE = (9, 8)
 
-def validate_image(path: Path, settings) -> tuple[bool, str]:
-    if not path.exists():
-        return False, "file_missing"
-    size_mb = path.stat().st_size / (1024 * 1024)
-    if size_mb > settings.max_file_size_mb:
+_ALLOWED_MIME_TYPES = frozenset({"image/jpeg", "image/png"})
+_JPEG_MAGIC = b"\xff\xd8\xff"
+_JPEG_EOI = b"\xff\xd9"
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+_PNG_IEND = b"IEND\xaeB`\x82"
+# SOFn markers carry the frame size; C4/C8/CC share the range but are not frames.
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+
+
+# file_size lets callers that already stat-ed the file skip a second stat.
+def validate_image(path: Path, settings, file_size: Optional[int] = None) -> tuple[bool, str]:
+    if file_size is None:
+        try:
+            file_size = path.stat().st_size
+        except OSError:
+            return False, "file_missing"
+    if file_size / (1024 * 1024) > settings.max_file_size_mb:
         return False, "file_too_large"
+    try:
+        header = _read_image_header(path)
+    except OSError:
+        header = None
+    if header is None:
+        # Unknown, truncated, or unusual layout: let Pillow decide.
+        return _validate_with_pil(path, settings)
+    width, height = header
+    return _check_dimensions(width, height, settings)
+
+
+def _check_dimensions(width: int, height: int, settings) -> tuple[bool, str]:
+    if width < settings.image_min_width or height < settings.image_min_height:
+        return False, "image_too_small"
+    if width > settings.image_max_width or height > settings.image_max_height:
+        return False, "image_too_large"
+    return True, "ok"
+
+
+def _validate_with_pil(path: Path, settings) -> tuple[bool, str]:
     try:
         with Image.open(path) as img:
-            fmt = (img.format or "").upper()
-            if fmt not in {"JPEG", "PNG", "JPG"}:
+            if Image.MIME.get(img.format or "") not in _ALLOWED_MIME_TYPES:
                 return False, "unsupported_format"
-            width, height = img.size
-            if width < settings.image_min_width or height < settings.image_min_height:
-                return False, "image_too_small"
-            if width > settings.image_max_width or height > settings.image_max_height:
-                return False, "image_too_large"
-            img.verify()
+            valid, reason = _check_dimensions(img.size[0], img.size[1], settings)
+            if not valid:
+                return valid, reason
+            # Size checks above use the header; decode at a reduced JPEG scale
+            # just to prove the payload is readable.
+            img.draft("RGB", (settings.image_min_width, settings.image_min_height))
+            img.load()
     except (OSError, ValueError):
         return False, "decode_error"
     return True, "ok"
 
 
+# Reads only the signature, frame header and end-of-image trailer. Returns
+# None whenever the fast path cannot vouch for the file.
+def _read_image_header(path: Path) -> tuple[int, int] | None:
+    with open(path, "rb") as handle:
+        magic = handle.read(8)
+        if magic.startswith(_JPEG_MAGIC):
+            size = _read_jpeg_size(handle)
+            trailer = _JPEG_EOI
+        elif magic == _PNG_MAGIC:
+            ihdr = handle.read(16)
+            if len(ihdr) < 16 or ihdr[4:8] != b"IHDR":
+                return None
+            size = (int.from_bytes(ihdr[8:12], "big"), int.from_bytes(ihdr[12:16], "big"))
+            trailer = _PNG_IEND
+        else:
+            return None
+        if size is None:
+            return None
+        handle.seek(-len(trailer), 2)
+        if handle.read(len(trailer)) != trailer:
+            return None
+    return size
+
+
+def _read_jpeg_size(handle) -> tuple[int, int] | None:
+    handle.seek(2)
+    while True:
+        byte = handle.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            return None
+        marker = handle.read(1)
+        while marker == b"\xff":
+            marker = handle.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _JPEG_STANDALONE_MARKERS:
+            continue
+        length_bytes = handle.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = int.from_bytes(length_bytes, "big")
+        if length < 2:
+            return None
+        if code in _JPEG_SOF_MARKERS:
+            frame = handle.read(5)
+            if len(frame) < 5:
+                return None
+            height = int.from_bytes(frame[1:3], "big")
+            width = int.from_bytes(frame[3:5], "big")
+            return width, height
+        if code in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header.
+            return None
+        handle.seek(length - 2, 1)
+
+
 def is_dark_frame(path: Path, threshold: float = 10.0) -> bool:
     try:
         with Image.open(path) as img:
+            # Mean brightness survives heavy downsampling; let libjpeg decode
+            # at reduced scale and average a small thumbnail.
+            img.draft("L", DARK_FRAME_SAMPLE_SIZE)
             img = img.convert("L")
-            stat = ImageStat.Stat(img)
-            return stat.mean[0] < threshold
+            img.thumbnail(DARK_FRAME_SAMPLE_SIZE, Image.Resampling.NEAREST)
+            return float(np.asarray(img).mean()) < threshold
     except OSError:
         return True
 
@@ -41,10 +144,40 @@ def diff_percent(path_a: Path, path_b: Path) -> float:
         img_b = img_b.convert("RGB")
         if img_a.size != img_b.size:
             img_b = img_b.resize(img_a.size)
-        diff = ImageChops.difference(img_a, img_b).convert("L")
-        hist = diff.histogram()
-        pixels = img_a.size[0] * img_a.size[1]
-        changed = sum(hist[26:])
-        if pixels == 0:
-            return 0.0
-        return (changed / pixels) * 100.0
+        arr_a = np.asarray(img_a, dtype=np.int16)
+        arr_b = np.asarray(img_b, dtype=np.int16)
+    if arr_a.size == 0:
+        return 0.0
+    diff = np.abs(arr_a - arr_b).max(axis=2)
+    changed = int(np.count_nonzero(diff > DIFF_PIXEL_THRESHOLD))
+    return (changed / diff.size) * 100.0
+
+
+# 64-bit difference hash; compare with hamming_distance. Returns None for
+# unreadable files so callers fall through to the full compare.
+def image_hash(path: Path) -> Optional[int]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return _image_hash_cached(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=512)
+def _image_hash_cached(path: str, mtime_ns: int, size: int) -> Optional[int]:
+    try:
+        with Image.open(path) as img:
+            img.draft("L", DARK_FRAME_SAMPLE_SIZE)
+            img = img.convert("L").resize(DHASH_SIZE, Image.Resampling.BILINEAR)
+            pixels = np.asarray(img, dtype=np.int16)
+    except OSError:
+        return None
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    return bin(hash_a ^ hash_b).count("1")
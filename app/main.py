@@ -1,16 +1,19 @@
+import asyncio
+import hashlib
 import os
-import queue
 import shutil
 import threading
+import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-from apscheduler.schedulers.background import BackgroundScheduler
+import orjson
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 from pydantic import BaseModel
@@ -19,15 +22,25 @@ from watchdog.observers import Observer
 from watchdog.observers.polling import PollingObserver
 
 from .config import SCHEMA_VERSION, load_settings
-from .monitoring import configure_logging, health_status, metrics
+from .monitoring import _iso_to_epoch, configure_logging, health_status, metrics
 from .retention import cleanup
-from .storage import fetch_records, list_snapshot_files, read_last_processed, write_schema_version
+from .storage import (
+    fetch_records,
+    list_snapshot_files,
+    list_snapshot_files_with_mtime,
+    read_last_processed,
+    record_list_version,
+    write_schema_version,
+)
 from .tasks import TaskRunner, _parse_snapshot_time
 from .usage import summarize_usage
 
 settings = load_settings()
 configure_logging(settings.logs_dir / "app.log", settings.log_level)
 write_schema_version(settings.data_dir, SCHEMA_VERSION)
+_DATA_ROOT = settings.data_dir.resolve()
+_SNAPSHOTS_ROOT = settings.snapshots_dir.resolve()
+_SNAPSHOTS_ROOT_PREFIX = str(_SNAPSHOTS_ROOT) + os.sep
 WEB_DIR = Path(os.getenv("WEB_DIR", "/web"))
 if not WEB_DIR.exists():
     fallback = Path(__file__).resolve().parent.parent / "web"
@@ -35,7 +48,12 @@ if not WEB_DIR.exists():
         WEB_DIR = fallback
 
 
-app = FastAPI()
+class OrjsonResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(default_response_class=OrjsonResponse)
 runner = TaskRunner(settings, metrics)
 ASK_MAX_LOOKBACK_HOURS = 168
 ASK_MAX_ITEMS = 200
@@ -46,6 +64,11 @@ STORY_MAX_HOURS = 168
 STORY_MAX_ITEMS = 48
 HIGHLIGHT_MAX_HOURS = 168
 HIGHLIGHT_MAX_ITEMS = 1000
+SNAPSHOT_BATCH_MAX = 16
+_SNAPSHOT_SUFFIXES = frozenset({".jpg", ".jpeg", ".png"})
+_PROTECTED_PREFIXES = ("/api/", "/data/")
+DISK_USAGE_TTL_SEC = 5.0
+_disk_usage_cache: Optional[tuple[float, Any]] = None
 
 
 def _is_api_key_valid(request: Request) -> bool:
@@ -55,16 +78,26 @@ def _is_api_key_valid(request: Request) -> bool:
     return supplied == settings.api_key
 
 
-@app.middleware("http")
 async def _api_key_guard(request: Request, call_next):
-    if settings.api_key and (request.url.path.startswith("/api/") or request.url.path.startswith("/data/")):
-        if not _is_api_key_valid(request):
-            return JSONResponse({"detail": "unauthorized"}, status_code=401)
+    if request.url.path.startswith(_PROTECTED_PREFIXES) and not _is_api_key_valid(request):
+        return OrjsonResponse({"detail": "unauthorized"}, status_code=401)
     return await call_next(request)
 
-snapshot_queue: queue.Queue[Path] = queue.Queue()
-enqueued_paths: set[Path] = set()
-enqueued_lock = threading.Lock()
+
+# Only pay for the middleware when a key is configured.
+if settings.api_key:
+    app.middleware("http")(_api_key_guard)
+
+snapshot_queue: asyncio.Queue[Path] = asyncio.Queue()
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_task: Optional[asyncio.Task] = None
+# Keys are paths currently queued or in flight. dict.setdefault/pop are atomic
+# single-key operations, so no separate lock is needed for de-duplication.
+enqueued_paths: dict[Path, object] = {}
+latest_snapshot: Optional[Path] = None
+latest_snapshot_ts: Optional[datetime] = None
+latest_snapshot_lock = threading.Lock()
+_scan_settled_paths: frozenset[Path] = frozenset()
 
 
 class CompareRequest(BaseModel):
@@ -109,16 +142,50 @@ def _load_last_processed_path() -> None:
             runner.last_seen_path = None
     if last_processed.get("timestamp"):
         metrics.last_snapshot_time = last_processed["timestamp"]
+        metrics.last_snapshot_epoch = _iso_to_epoch(last_processed["timestamp"])
+
+
+def _record_latest_snapshot(path: Path) -> None:
+    global latest_snapshot, latest_snapshot_ts
+    ts = _parse_snapshot_time(path, settings)
+    if ts is None:
+        return
+    with latest_snapshot_lock:
+        if latest_snapshot_ts is None or ts >= latest_snapshot_ts:
+            latest_snapshot = path
+            latest_snapshot_ts = ts
+
+
+def _latest_snapshot_path() -> Optional[Path]:
+    global latest_snapshot, latest_snapshot_ts
+    with latest_snapshot_lock:
+        cached = latest_snapshot
+    if cached is not None and cached.exists():
+        return cached
+    # Cold start (or the cached file was removed): fall back to a full listing.
+    snapshots = list_snapshot_files(settings.snapshots_dir)
+    if not snapshots:
+        return None
+    latest = snapshots[-1]
+    with latest_snapshot_lock:
+        latest_snapshot = latest
+        latest_snapshot_ts = _parse_snapshot_time(latest, settings)
+    return latest
 
 
 def _enqueue_snapshot(path: Path) -> None:
     if not _is_snapshot(path):
         return
-    with enqueued_lock:
-        if path in enqueued_paths:
-            return
-        enqueued_paths.add(path)
-    snapshot_queue.put(path)
+    _record_latest_snapshot(path)
+    marker = object()
+    if enqueued_paths.setdefault(path, marker) is not marker:
+        return
+    # Watchdog and scheduler jobs call this from worker threads; hand the path
+    # to the event loop that owns the queue.
+    if _event_loop is not None:
+        _event_loop.call_soon_threadsafe(snapshot_queue.put_nowait, path)
+    else:
+        snapshot_queue.put_nowait(path)
 
 
 class SnapshotHandler(FileSystemEventHandler):
@@ -134,58 +201,80 @@ class SnapshotHandler(FileSystemEventHandler):
 
 
 def _is_snapshot(path: Path) -> bool:
-    return path.suffix.lower() in {".jpg", ".jpeg", ".png"} and not path.name.endswith(".tmp")
+    name = path.name
+    return not name.endswith(".tmp") and name[name.rfind("."):].lower() in _SNAPSHOT_SUFFIXES
 
 
-def _worker() -> None:
+async def _worker() -> None:
     while True:
-        path = snapshot_queue.get()
+        batch = [await snapshot_queue.get()]
+        while len(batch) < SNAPSHOT_BATCH_MAX:
+            try:
+                batch.append(snapshot_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
         try:
-            runner.process_snapshot(path)
+            await asyncio.to_thread(runner.process_snapshot_batch, batch)
         except Exception as exc:  # noqa: BLE001
-            logger.error("Processing failed for {path}: {error}", path=str(path), error=str(exc))
+            logger.error("Batch processing failed: {error}", error=str(exc))
         finally:
-            with enqueued_lock:
-                enqueued_paths.discard(path)
-            snapshot_queue.task_done()
+            for path in batch:
+                enqueued_paths.pop(path, None)
+                snapshot_queue.task_done()
 
 
 def _scan_new_snapshots() -> None:
+    global _scan_settled_paths
     last_processed = _load_last_processed()
     last_ts = _parse_iso(last_processed.get("timestamp"))
-    for path in list_snapshot_files(settings.snapshots_dir):
+    # Membership, not mtime, decides what to look at: files copied in with a
+    # preserved (older) mtime or sharing a coarse mtime tick are still caught.
+    # Only paths not settled by an earlier scan are parsed, and the set
+    # difference runs in C. A path settles once it is at or before the last
+    # processed time; newer ones stay unsettled so a failed run is retried,
+    # as before. Rebuilding from the listing forgets files retention removed.
+    listing = list_snapshot_files_with_mtime(settings.snapshots_dir)
+    current = frozenset(path for _, path in listing)
+    candidates = []
+    for path in current - _scan_settled_paths:
         ts = _parse_snapshot_time(path, settings)
         if ts is None:
             continue
         if last_ts is None or ts > last_ts:
-            _enqueue_snapshot(path)
+            candidates.append((ts, path))
+    _scan_settled_paths = current.difference(path for _, path in candidates)
+    candidates.sort()
+    for _, path in candidates:
+        _enqueue_snapshot(path)
 
 
 def _parse_iso(value):
     if not value:
         return None
     try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return datetime.fromisoformat(value)
     except ValueError:
         return None
 
 
 def _parse_range_value(value: str) -> datetime:
     try:
-        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        parsed = datetime.fromisoformat(value)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail="invalid datetime format") from exc
     if parsed.tzinfo is None:
-        if hasattr(settings.tz, "localize"):
-            parsed = settings.tz.localize(parsed)
-        else:
-            parsed = parsed.replace(tzinfo=settings.tz)
+        parsed = parsed.replace(tzinfo=settings.tz)
     return parsed.astimezone(timezone.utc)
 
 
 def _start_watchdog() -> None:
     handler = SnapshotHandler()
-    observer = PollingObserver() if settings.camera_source == "windows-host" else Observer()
+    if settings.camera_source == "windows-host":
+        # Bind mounts from a Windows host do not deliver inotify events, so the
+        # tree is stat-walked; poll less often and rely on the 1-minute scan.
+        observer = PollingObserver(timeout=settings.watch_poll_interval_sec)
+    else:
+        observer = Observer()
     observer.schedule(handler, str(settings.snapshots_dir), recursive=True)
     observer.daemon = True
     observer.start()
@@ -198,21 +287,19 @@ def _resolve_snapshot_path(path_value: str) -> Path:
     if trimmed.startswith("/data/"):
         trimmed = trimmed[len("/data/"):]
     trimmed = trimmed.lstrip("/")
-    data_root = settings.data_dir.resolve()
-    snapshots_root = settings.snapshots_dir.resolve()
-    candidate = (data_root / trimmed).resolve()
-    if snapshots_root not in candidate.parents:
-        candidate = (snapshots_root / trimmed).resolve()
-    if snapshots_root not in candidate.parents:
+    candidate = (_DATA_ROOT / trimmed).resolve()
+    if not str(candidate).startswith(_SNAPSHOTS_ROOT_PREFIX):
+        candidate = (_SNAPSHOTS_ROOT / trimmed).resolve()
+    if not str(candidate).startswith(_SNAPSHOTS_ROOT_PREFIX):
         raise HTTPException(status_code=400, detail="snapshot path must be under snapshots directory")
-    if candidate.suffix.lower() not in {".jpg", ".jpeg", ".png"}:
+    if candidate.suffix.lower() not in _SNAPSHOT_SUFFIXES:
         raise HTTPException(status_code=400, detail="invalid snapshot file type")
     if not candidate.exists():
         raise HTTPException(status_code=404, detail="snapshot not found")
     return candidate
 
 
-scheduler = BackgroundScheduler(timezone=settings.tz)
+scheduler: Optional[AsyncIOScheduler] = None
 
 
 def _schedule_jobs() -> None:
@@ -266,45 +353,82 @@ def _capture_job() -> None:
 
 
 @app.on_event("startup")
-def _on_startup() -> None:
+async def _on_startup() -> None:
+    global _event_loop, _worker_task, scheduler
+    _event_loop = asyncio.get_running_loop()
     _load_last_processed_path()
-    threading.Thread(target=_worker, daemon=True).start()
+    _worker_task = asyncio.create_task(_worker())
     if settings.camera_source == "windows-host":
         _start_watchdog()
-    _scan_new_snapshots()
+    await asyncio.to_thread(_scan_new_snapshots)
+    # Sync jobs still run in the scheduler's thread pool executor; the
+    # scheduler itself is driven by the application's event loop.
+    scheduler = AsyncIOScheduler(timezone=settings.tz, event_loop=_event_loop)
     _schedule_jobs()
     scheduler.start()
 
 
+@app.on_event("shutdown")
+async def _on_shutdown() -> None:
+    runner.close()
+
+
+def _etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(orjson.dumps(parts), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_response(request: Request, payload: Any, etag: str, cache_control: str = "no-cache") -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    return OrjsonResponse(payload, headers=headers)
+
+
 @app.get("/")
 def root():
     return FileResponse(str(WEB_DIR / "index.html"), headers={"Cache-Control": "no-store"})
 
 
+CONFIG_PAYLOAD = {
+    "ui_refresh_interval_sec": settings.ui_refresh_interval_sec,
+    "timezone": settings.timezone,
+    "ask_enabled": settings.ask_enabled,
+    "ask_lookback_hours": settings.ask_lookback_hours,
+    "ask_max_items": settings.ask_max_items,
+    "preview_cooldown_sec": settings.preview_cooldown_sec,
+}
+CONFIG_ETAG = _etag(SCHEMA_VERSION, CONFIG_PAYLOAD)
+
+
 @app.get("/api/config")
-def api_config():
-    return {
-        "ui_refresh_interval_sec": settings.ui_refresh_interval_sec,
-        "timezone": settings.timezone,
-        "ask_enabled": settings.ask_enabled,
-        "ask_lookback_hours": settings.ask_lookback_hours,
-        "ask_max_items": settings.ask_max_items,
-        "preview_cooldown_sec": settings.preview_cooldown_sec,
-    }
+def api_config(request: Request):
+    return _etag_response(request, CONFIG_PAYLOAD, CONFIG_ETAG, "private, max-age=60")
+
+
+def _cached_disk_usage():
+    global _disk_usage_cache
+    now = time.monotonic()
+    cached = _disk_usage_cache
+    if cached is not None and now - cached[0] < DISK_USAGE_TTL_SEC:
+        return cached[1]
+    usage = shutil.disk_usage(settings.data_dir)
+    _disk_usage_cache = (now, usage)
+    return usage
 
 
 @app.get("/api/health")
 def api_health():
-    usage = shutil.disk_usage(settings.data_dir)
+    usage = _cached_disk_usage()
     disk_free_mb = usage.free / (1024 * 1024)
     queue_depth = snapshot_queue.qsize()
     status = health_status(
-        metrics.last_snapshot_time,
+        metrics.last_snapshot_epoch,
         disk_free_mb,
         queue_depth,
         settings.capture_interval_min,
     )
-    return JSONResponse(
+    return OrjsonResponse(
         {
             "status": status,
             "last_snapshot_time": metrics.last_snapshot_time,
@@ -324,11 +448,15 @@ def api_health():
 
 
 @app.get("/api/metrics")
-def api_metrics():
-    usage = shutil.disk_usage(settings.data_dir)
+def api_metrics(request: Request):
+    usage = _cached_disk_usage()
     disk_used_mb = usage.used / (1024 * 1024)
     disk_free_mb = usage.free / (1024 * 1024)
-    return JSONResponse(metrics.to_metrics_json(disk_used_mb, disk_free_mb))
+    payload = metrics.to_metrics_json(disk_used_mb, disk_free_mb)
+    # uptime_seconds ticks every second; leave it out so the tag only changes
+    # when snapshot, API call, or storage figures do.
+    etag = _etag({key: value for key, value in payload.items() if key != "uptime_seconds"})
+    return _etag_response(request, payload, etag)
 
 
 @app.get("/api/usage/summary")
@@ -339,10 +467,9 @@ def api_usage_summary(days: int = 7):
 
 @app.get("/api/snapshots/latest")
 def api_latest_snapshot():
-    snapshots = list_snapshot_files(settings.snapshots_dir)
-    if not snapshots:
+    latest = _latest_snapshot_path()
+    if latest is None:
         return {"snapshot": None, "timestamp": None}
-    latest = snapshots[-1]
     ts = _parse_snapshot_time(latest, settings)
     timestamp = ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z") if ts else None
     try:
@@ -361,26 +488,31 @@ def api_preview():
     if preview_path and preview_path.exists():
         return FileResponse(preview_path, headers={"Cache-Control": "no-store"})
 
-    snapshots = list_snapshot_files(settings.snapshots_dir)
-    if not snapshots:
+    latest = _latest_snapshot_path()
+    if latest is None:
         raise HTTPException(status_code=404, detail="no preview available")
-    return FileResponse(snapshots[-1], headers={"Cache-Control": "no-store"})
+    return FileResponse(latest, headers={"Cache-Control": "no-store"})
 
 
 @app.get("/api/descriptions")
-def api_descriptions(limit: Optional[int] = None, offset: int = 0):
-    if limit is None:
-        return fetch_records(settings.data_dir, "descriptions")
-    safe_limit = max(1, min(limit, DESCRIPTIONS_MAX_LIMIT))
+def api_descriptions(request: Request, limit: Optional[int] = None, offset: int = 0):
+    safe_limit = max(1, min(limit, DESCRIPTIONS_MAX_LIMIT)) if limit is not None else None
     safe_offset = max(0, offset)
-    items = fetch_records(
-        settings.data_dir,
-        "descriptions",
-        limit=safe_limit,
-        offset=safe_offset,
-        newest_first=True,
-    )
-    return list(reversed(items))
+    etag = _etag(record_list_version(settings.data_dir, "descriptions"), safe_limit, safe_offset)
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    if safe_limit is None:
+        items = fetch_records(settings.data_dir, "descriptions")
+    else:
+        items = fetch_records(
+            settings.data_dir,
+            "descriptions",
+            limit=safe_limit,
+            offset=safe_offset,
+            newest_first=True,
+        )
+        items.reverse()
+    return _etag_response(request, items, etag)
 
 
 @app.get("/api/compare/10m")
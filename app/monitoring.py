@@ -1,7 +1,9 @@
 ﻿import sys
+import threading
 import time
 from datetime import datetime
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, Optional
 
 from loguru import logger
@@ -12,6 +14,15 @@ class ApiCallStats:
     success: int = 0
     failure: int = 0
     latency_total_ms: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, success: bool, latency_ms: float) -> None:
+        with self._lock:
+            if success:
+                self.success += 1
+            else:
+                self.failure += 1
+            self.latency_total_ms += latency_ms
 
     @property
     def avg_latency_ms(self) -> float:
@@ -26,6 +37,7 @@ class Metrics:
     start_time: float = field(default_factory=time.time)
     snapshots_processed_total: int = 0
     last_snapshot_time: Optional[str] = None
+    last_snapshot_epoch: Optional[float] = None
     last_groq_success: Optional[str] = None
     last_groq_failure: Optional[str] = None
     last_gemini_success: Optional[str] = None
@@ -37,14 +49,13 @@ class Metrics:
     def record_snapshot(self, timestamp_iso: str) -> None:
         self.snapshots_processed_total += 1
         self.last_snapshot_time = timestamp_iso
+        self.last_snapshot_epoch = time.time()
 
     def record_api_call(self, provider: str, success: bool, latency_ms: float) -> None:
-        stats = self.api_calls.setdefault(provider, ApiCallStats())
-        if success:
-            stats.success += 1
-        else:
-            stats.failure += 1
-        stats.latency_total_ms += latency_ms
+        stats = self.api_calls.get(provider)
+        if stats is None:
+            stats = self.api_calls.setdefault(provider, ApiCallStats())
+        stats.record(success, latency_ms)
 
     def to_metrics_json(self, disk_used_mb: float, disk_free_mb: float) -> dict:
         return {
@@ -82,16 +93,16 @@ def configure_logging(log_path, log_level: str) -> None:
 
 
 def health_status(
-    last_snapshot_time: Optional[str],
+    last_snapshot_epoch: Optional[float],
     disk_free_mb: float,
     queue_depth: int,
     capture_interval_min: int,
 ) -> str:
     if disk_free_mb < 100:
         return "unhealthy"
-    if last_snapshot_time is None:
+    if last_snapshot_epoch is None:
         return "degraded"
-    age_seconds = time.time() - _iso_to_epoch(last_snapshot_time)
+    age_seconds = time.time() - last_snapshot_epoch
     if age_seconds > capture_interval_min * 120:
         return "degraded"
     if queue_depth > 20:
@@ -99,9 +110,9 @@ def health_status(
     return "healthy"
 
 
+@lru_cache(maxsize=256)
 def _iso_to_epoch(timestamp: str) -> float:
     try:
-        parsed = timestamp.replace("Z", "+00:00")
-        return datetime.fromisoformat(parsed).timestamp()
+        return datetime.fromisoformat(timestamp).timestamp()
     except ValueError:
         return 0.0
@@ -1,6 +1,9 @@
-﻿import threading
+﻿import random
+import threading
 import time
-from collections import deque
+
+BACKOFF_MAX_DELAY_SEC = 60.0
+_BACKOFF_MAX_EXPONENT = 10
 
 
 class RateLimiter:
@@ -9,31 +12,47 @@ class RateLimiter:
         self.max_attempts = max(1, max_attempts)
         self.base_delay = max(1, base_delay)
         self.circuit_threshold = max(1, circuit_threshold)
-        self.timestamps = deque()
+        # Token bucket: holds up to one minute of requests and refills at
+        # rpm/60 per second on the monotonic clock.
+        self.capacity = float(self.rpm)
+        self.tokens = self.capacity
+        self.refill_rate = self.rpm / 60.0
+        self.last_refill = time.monotonic()
         self.lock = threading.Lock()
+        # Waiters sleep on the condition rather than in time.sleep, so closing
+        # the circuit wakes them instead of leaving them asleep for the rest of
+        # the cooldown.
+        self.cond = threading.Condition(self.lock)
         self.failure_count = 0
         self.circuit_open_until = 0.0
 
     def acquire(self) -> None:
-        while True:
-            sleep_for = 0.0
-            with self.lock:
+        with self.cond:
+            while True:
+                # The circuit deadline is wall-clock; refill uses the monotonic clock.
                 now = time.time()
-                self._prune(now)
                 if self.circuit_open_until > now:
                     sleep_for = self.circuit_open_until - now
-                elif len(self.timestamps) >= self.rpm:
-                    sleep_for = 60 - (now - self.timestamps[0])
                 else:
-                    self.timestamps.append(now)
-                    return
-            if sleep_for > 0:
-                time.sleep(sleep_for)
+                    mono = time.monotonic()
+                    self.tokens = min(
+                        self.capacity, self.tokens + (mono - self.last_refill) * self.refill_rate
+                    )
+                    self.last_refill = mono
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return
+                    sleep_for = (1.0 - self.tokens) / self.refill_rate
+                self.cond.wait(sleep_for)
 
     def record_success(self) -> None:
-        with self.lock:
+        # Racy read is fine: at worst a concurrent failure costs one extra lock.
+        if self.failure_count == 0 and self.circuit_open_until == 0.0:
+            return
+        with self.cond:
             self.failure_count = 0
             self.circuit_open_until = 0.0
+            self.cond.notify_all()
 
     def record_failure(self) -> None:
         with self.lock:
@@ -43,9 +62,10 @@ class RateLimiter:
                 self.failure_count = 0
 
     def backoff(self, attempt: int) -> None:
-        delay = self.base_delay * (2 ** max(0, attempt - 1))
-        time.sleep(delay)
-
-    def _prune(self, now: float) -> None:
-        while self.timestamps and (now - self.timestamps[0]) > 60:
-            self.timestamps.popleft()
+        # Full jitter: concurrent callers that failed together retry at
+        # spread-out times instead of in lockstep.
+        exponent = min(max(0, attempt - 1), _BACKOFF_MAX_EXPONENT)
+        delay = min(self.base_delay * (1 << exponent), BACKOFF_MAX_DELAY_SEC)
+        # A success elsewhere means the provider recovered, so retry at once.
+        with self.cond:
+            self.cond.wait(random.uniform(0, delay))
@@ -1,26 +1,49 @@
 ﻿import shutil
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
 
 from loguru import logger
 
 from . import storage
+from .tasks import _parse_snapshot_time
+
+# Unlinks are I/O-bound, so a few threads overlap the per-file latency.
+RETENTION_REMOVE_WORKERS = 8
 
 
 def cleanup(settings, dry_run: bool = False, archive: bool = False) -> None:
     cutoff = datetime.now(timezone.utc) - timedelta(days=settings.retention_days)
-    snapshots = storage.list_snapshot_files(settings.snapshots_dir)
-    snapshots_sorted = sorted(snapshots, key=lambda p: p.stat().st_mtime)
+    cutoff_epoch = cutoff.timestamp()
+    # Already sorted by mtime from the scan.
+    entries = storage.list_snapshot_files_with_mtime(settings.snapshots_dir)
 
+    # The newest keep_count snapshots are the tail of the sorted list.
     keep_count = max(settings.retention_min_snapshots, 0)
-    keep = set(snapshots_sorted[-keep_count:]) if keep_count else set()
-    for path in snapshots_sorted:
-        snapshot_time = _parse_snapshot_time(path, settings)
-        if path in keep:
-            continue
-        if snapshot_time and snapshot_time > cutoff:
-            continue
-        _remove_snapshot_bundle(path, settings, dry_run, archive)
+    boundary = max(0, len(entries) - keep_count)
+    if settings.retention_use_filename_time:
+        # mtime is unreliable after restores; trust the capture time in the path.
+        to_remove = []
+        for _, path in entries[:boundary]:
+            snapshot_time = _parse_snapshot_time(path, settings)
+            if snapshot_time and snapshot_time > cutoff:
+                continue
+            to_remove.append(path)
+    else:
+        # Expired snapshots are a prefix of the mtime-sorted list.
+        expired = bisect_right(entries, cutoff_epoch, hi=boundary, key=itemgetter(0))
+        to_remove = [path for _, path in entries[:expired]]
+    if dry_run or archive or len(to_remove) < 2:
+        # Dry-run logs stay ordered; archive moves share destination dirs.
+        for path in to_remove:
+            _remove_snapshot_bundle(path, settings, dry_run, archive)
+    else:
+        with ThreadPoolExecutor(max_workers=RETENTION_REMOVE_WORKERS) as pool:
+            remove = partial(_remove_snapshot_bundle, settings=settings, dry_run=False, archive=False)
+            list(pool.map(remove, to_remove))
 
     for list_name in [
         "descriptions",
@@ -33,7 +56,7 @@ def cleanup(settings, dry_run: bool = False, archive: bool = False) -> None:
         _prune_records_list(settings, list_name, cutoff, dry_run)
 
 
-def _remove_path(path: Path, settings, dry_run: bool, archive: bool) -> None:
+def _remove_path(path: Path, settings, dry_run: bool, archive: bool, missing_ok: bool = False) -> None:
     if dry_run:
         logger.info("Retention dry-run: would remove {path}", path=str(path))
         return
@@ -51,6 +74,9 @@ def _remove_path(path: Path, settings, dry_run: bool, archive: bool) -> None:
     try:
         path.unlink()
         logger.info("Removed {path}", path=str(path))
+    except FileNotFoundError as exc:
+        if not missing_ok:
+            logger.warning("Failed to remove {path}: {error}", path=str(path), error=str(exc))
     except OSError as exc:
         logger.warning("Failed to remove {path}: {error}", path=str(path), error=str(exc))
 
@@ -68,8 +94,13 @@ def _remove_snapshot_bundle(path: Path, settings, dry_run: bool, archive: bool)
         settings.compare_hourly_dir / json_relative,
     ]
     for derived in derived_paths:
-        if derived.exists():
-            _remove_path(derived, settings, dry_run, archive)
+        if dry_run or archive:
+            if derived.exists():
+                _remove_path(derived, settings, dry_run, archive)
+        else:
+            # Most snapshots lack some artifacts; a failed unlink is cheaper
+            # than stat-then-unlink.
+            _remove_path(derived, settings, dry_run, archive, missing_ok=True)
 
 
 def _prune_records_list(settings, list_name: str, cutoff: datetime, dry_run: bool) -> None:
@@ -81,20 +112,3 @@ def _prune_records_list(settings, list_name: str, cutoff: datetime, dry_run: boo
             count=removed,
         )
 
-
-def _parse_snapshot_time(path: Path, settings):
-    try:
-        parts = path.parts
-        filename = path.stem
-        year = int(parts[-4])
-        month = int(parts[-3])
-        day = int(parts[-2])
-        hour = int(filename[0:2])
-        minute = int(filename[2:4])
-        second = int(filename[4:6])
-        local_dt = settings.tz.localize(
-            datetime(year, month, day, hour, minute, second)
-        )
-        return local_dt.astimezone(timezone.utc)
-    except (ValueError, IndexError):
-        return None
@@ -1,13 +1,20 @@
-﻿import json
+﻿import atexit
+import errno
+import json
 import os
+import queue
 import sqlite3
-import tempfile
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, Iterable, Optional, TypeVar
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+import orjson
+from loguru import logger
 
 try:
     import fcntl  # type: ignore
@@ -19,11 +26,32 @@ try:
 except ImportError:  # pragma: no cover - linux fallback
     msvcrt = None
 
+_ensured_dirs_lock = threading.Lock()
+_ensured_dirs: set[str] = set()
+_lock_fds_lock = threading.Lock()
+_lock_fds: dict[str, tuple[int, threading.Lock]] = {}
+
+_JSON_LIST_TAIL_BYTES = 64
+_JSON_PREFIX_DECODER = json.JSONDecoder()
+# Lists fully parsed by this process since it started. A torn in-place append
+# can only be left behind by a crash, so one check per file per process is
+# enough before patching it in place.
+_json_lists_verified: set[str] = set()
+
+_JSON_CACHE_MAX_ENTRIES = 256
+_json_cache_lock = threading.Lock()
+_json_cache: OrderedDict[str, tuple[tuple[int, int, int], Any]] = OrderedDict()
+
 _SNAPSHOT_CACHE_TTL_SEC = 2.0
+_SNAPSHOT_EXTENSIONS = frozenset({"jpg", "jpeg", "png"})
 _snapshot_cache_lock = threading.Lock()
 _snapshot_cache_root: Optional[Path] = None
 _snapshot_cache_ts = 0.0
-_snapshot_cache_files: list[Path] = []
+_snapshot_cache_entries: list[tuple[float, Path]] = []
+_snapshot_cache_dir_mtimes: dict[str, float] = {}
+_SNAPSHOT_DIR_MTIME_SLACK_SEC = 2.0
+_SNAPSHOT_INDEX_VERSION = 1
+_SNAPSHOT_SCAN_WORKERS = 4
 
 _RECORD_DB_NAME = "records.db"
 _RECORD_LISTS = {
@@ -39,85 +67,304 @@ _migrated_record_lists: set[tuple[str, str]] = set()
 _record_db_init_lock = threading.Lock()
 _record_db_initialized: set[str] = set()
 _RECORD_DB_TIMEOUT_SEC = 30
+_record_conn_local = threading.local()
+_record_conns_lock = threading.Lock()
+_record_conns: list[sqlite3.Connection] = []
 _RECORD_DB_BUSY_TIMEOUT_MS = 30_000
+_RECORD_WRITE_BATCH_MAX = 256
+_RECORD_WRITE_LINGER_SEC = 0.01
+_RECORD_STREAM_BATCH_ROWS = 512
+_record_write_queue: "queue.SimpleQueue[tuple[str, tuple, Future]]" = queue.SimpleQueue()
+_record_writer_lock = threading.Lock()
+_record_writer_thread: Optional[threading.Thread] = None
+_record_pending_cond = threading.Condition()
+_record_pending_writes = 0
+_RECORD_INSERT_SQL = (
+    "INSERT INTO records (list_name, timestamp, timestamp_epoch, data) VALUES (?, ?, ?, ?)"
+)
+# Legacy list migration in one statement: SQLite walks the JSON array itself
+# and derives the epoch (millisecond precision) from timestamp or ts.
+_MIGRATE_RECORDS_SQL = (
+    "INSERT INTO records (list_name, timestamp, timestamp_epoch, data) "
+    "SELECT ?, ts, ROUND((julianday(ts) - 2440587.5) * 86400.0, 3), json(value) FROM ("
+    "SELECT key, value, COALESCE("
+    "NULLIF(json_extract(value, '$.timestamp'), ''), NULLIF(json_extract(value, '$.ts'), '')"
+    ") AS ts FROM json_each(?) WHERE type = 'object'"
+    ") ORDER BY key"
+)
 
 T = TypeVar("T")
 
 
 
+# Directories already created by this process are remembered so hot write
+# paths skip the mkdir syscall; callers that hit FileNotFoundError call
+# _forget_dir and retry.
 def ensure_dir(path: Path) -> None:
+    key = str(path)
+    if key in _ensured_dirs:
+        return
     path.mkdir(parents=True, exist_ok=True)
+    with _ensured_dirs_lock:
+        _ensured_dirs.add(key)
+
+
+def _forget_dir(path: Path) -> None:
+    with _ensured_dirs_lock:
+        _ensured_dirs.discard(str(path))
+
+
+_ATOMIC_WRITE_FLAGS = (
+    os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+)
+# Durable payloads above the threshold are flushed in slices so the final
+# fsync has little left to write and does not stall small writers behind it.
+_CHUNKED_SYNC_THRESHOLD_BYTES = 1 << 20
+_CHUNKED_SYNC_SLICE_BYTES = 256 << 10
+# Zero where directories cannot be opened for fsync (Windows).
+_DIR_FSYNC_FLAGS = (
+    os.O_RDONLY | os.O_DIRECTORY | getattr(os, "O_CLOEXEC", 0) if hasattr(os, "O_DIRECTORY") else 0
+)
+
+
+# Linux can create the temp file unnamed (O_TMPFILE) and link it in only once
+# it is complete, so scanners never see a partial file and a crash leaves no
+# orphan behind. Linking goes through /proc/self/fd, hence the procfs check.
+_O_TMPFILE = getattr(os, "O_TMPFILE", 0) if os.path.isdir("/proc/self/fd") else 0
+_tmpfile_unsupported_dirs: set[str] = set()
+
+
+# Temp names are unique per process and thread, so a plain os.open replaces
+# NamedTemporaryFile's random-name retries and finalizer; cleanup only runs
+# when the write fails.
+def _atomic_write_bytes(path: Path, payload: bytes, durable: bool) -> None:
+    ensure_dir(path.parent)
+    tmp_path = path.parent / f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = _open_unnamed_tmp(path.parent)
+    unnamed = fd is not None
+    if fd is None:
+        try:
+            fd = os.open(tmp_path, _ATOMIC_WRITE_FLAGS, 0o644)
+        except FileNotFoundError:
+            # Directory was removed behind the cache; recreate it once.
+            _forget_dir(path.parent)
+            ensure_dir(path.parent)
+            fd = os.open(tmp_path, _ATOMIC_WRITE_FLAGS, 0o644)
+    try:
+        try:
+            if durable and len(payload) > _CHUNKED_SYNC_THRESHOLD_BYTES:
+                _write_synced_slices(fd, payload)
+            else:
+                _write_all(fd, payload)
+            if durable:
+                _sync_file_data(fd)
+            if unnamed:
+                _link_unnamed_tmp(fd, tmp_path)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException as exc:
+        if unnamed and isinstance(exc, OSError) and exc.filename == f"/proc/self/fd/{fd}":
+            # Linking is refused here (hardened /proc, odd filesystem); the
+            # unnamed file vanished with its fd, so redo it with a named one.
+            _tmpfile_unsupported_dirs.add(str(path.parent))
+            _atomic_write_bytes(path, payload, durable)
+            return
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if durable:
+        _fsync_dir(path.parent)
+
+
+# None means use a named temp file: no O_TMPFILE support on this platform or
+# filesystem, or the directory is missing and the named path recreates it.
+def _open_unnamed_tmp(directory: Path) -> Optional[int]:
+    key = str(directory)
+    if not _O_TMPFILE or key in _tmpfile_unsupported_dirs:
+        return None
+    try:
+        return os.open(key, _O_TMPFILE | os.O_WRONLY | getattr(os, "O_CLOEXEC", 0), 0o644)
+    except OSError as exc:
+        if exc.errno in (errno.EOPNOTSUPP, errno.EISDIR, errno.EINVAL):
+            _tmpfile_unsupported_dirs.add(key)
+        return None
+
 
+# The /proc link must be followed, which os.link only does through linkat;
+# passing a dir fd forces that call, and an absolute path ignores the fd.
+def _link_unnamed_tmp(fd: int, tmp_path: Path) -> None:
+    source = f"/proc/self/fd/{fd}"
+    try:
+        os.link(source, tmp_path, src_dir_fd=fd, follow_symlinks=True)
+    except FileExistsError:
+        # Stale temp left by a crashed writer that had the same pid and thread id.
+        os.remove(tmp_path)
+        os.link(source, tmp_path, src_dir_fd=fd, follow_symlinks=True)
+
+
+# The rename is only durable once the directory entry is on disk. Windows has
+# no O_DIRECTORY, and SMB/NFS mounts may reject a directory fsync with
+# ENOTSUP/EINVAL; the file data is already synced, so those cases skip it.
+def _fsync_dir(directory: Path) -> None:
+    if not _DIR_FSYNC_FLAGS:
+        return
+    try:
+        dir_fd = os.open(directory, _DIR_FSYNC_FLAGS)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+# The payload is already one encoded bytes object, so it goes straight to
+# the fd: a buffered file object would only allocate a buffer and copy it.
+def _write_all(fd: int, payload) -> None:
+    view = memoryview(payload)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+# The temp file is brand new, so fdatasync (data plus the size needed to
+# read it back) is enough and skips the timestamp flush a full fsync adds.
+# The rename itself is made durable by the directory fsync.
+def _sync_file_data(fd: int) -> None:
+    getattr(os, "fdatasync", os.fsync)(fd)
 
+
+# Python does not expose sync_file_range, so fdatasync per slice is the
+# portable way to push dirty pages out incrementally; elsewhere it is a plain
+# write and the caller's single fsync does the work.
+def _write_synced_slices(fd: int, payload: bytes) -> None:
+    fdatasync = getattr(os, "fdatasync", None)
+    if fdatasync is None:
+        _write_all(fd, payload)
+        return
+    view = memoryview(payload)
+    for offset in range(0, len(view), _CHUNKED_SYNC_SLICE_BYTES):
+        _write_all(fd, view[offset : offset + _CHUNKED_SYNC_SLICE_BYTES])
+        fdatasync(fd)
+
+
+# shared=True takes a reader lock (LOCK_SH) so readers in different processes
+# overlap; writers always take it exclusively. Within one process both modes
+# go through the same thread lock. msvcrt has no shared mode, so on Windows
+# readers fall back to the exclusive lock.
 @contextmanager
-def file_lock(lock_path: Path):
+def file_lock(lock_path: Path, shared: bool = False):
+    if fcntl is not None:
+        fd, thread_lock = _get_lock_fd(lock_path)
+        # flock is per open file, so threads sharing the fd also need a
+        # process-local lock to exclude each other.
+        with thread_lock:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return
     ensure_dir(lock_path.parent)
     with open(lock_path, "a+", encoding="utf-8") as lock_file:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-        elif msvcrt is not None:
+        if msvcrt is not None:
             msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
         try:
             yield
         finally:
-            if fcntl is not None:
-                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-            elif msvcrt is not None:
+            if msvcrt is not None:
                 msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
 
 
-def atomic_write_json(path: Path, data: Any) -> None:
-    ensure_dir(path.parent)
-    tmp_file = None
-    try:
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            dir=str(path.parent),
-            delete=False,
-        ) as tmp_file:
-            json.dump(data, tmp_file, ensure_ascii=True, indent=2)
-            tmp_file.flush()
-            os.fsync(tmp_file.fileno())
-        os.replace(tmp_file.name, path)
-    finally:
-        if tmp_file is not None and os.path.exists(tmp_file.name):
-            try:
-                os.remove(tmp_file.name)
-            except OSError:
-                pass
+# Lock files stay open for the process lifetime so each lock is just a pair
+# of flock calls.
+def _get_lock_fd(lock_path: Path) -> tuple[int, threading.Lock]:
+    key = str(lock_path)
+    with _lock_fds_lock:
+        entry = _lock_fds.get(key)
+        if entry is None:
+            ensure_dir(lock_path.parent)
+            entry = (os.open(key, os.O_RDWR | os.O_CREAT, 0o644), threading.Lock())
+            _lock_fds[key] = entry
+    return entry
 
 
-def atomic_write_text(path: Path, data: str) -> None:
-    ensure_dir(path.parent)
-    tmp_file = None
-    try:
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            dir=str(path.parent),
-            delete=False,
-        ) as tmp_file:
-            tmp_file.write(data)
-            tmp_file.flush()
-            os.fsync(tmp_file.fileno())
-        os.replace(tmp_file.name, path)
-    finally:
-        if tmp_file is not None and os.path.exists(tmp_file.name):
-            try:
-                os.remove(tmp_file.name)
-            except OSError:
-                pass
+@atexit.register
+def _close_lock_fds() -> None:
+    with _lock_fds_lock:
+        fds = [fd for fd, _ in _lock_fds.values()]
+        _lock_fds.clear()
+    for fd in fds:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+# durable=False skips the fsync for state that is cheap to lose on a crash;
+# the rename still keeps readers from seeing a partial file.
+def atomic_write_json(path: Path, data: Any, *, durable: bool = True, compact: bool = False) -> None:
+    option = orjson.OPT_NON_STR_KEYS if compact else orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+    _atomic_write_bytes(path, orjson.dumps(data, option=option), durable)
+
 
+def atomic_write_text(path: Path, data: str, *, durable: bool = True) -> None:
+    _atomic_write_bytes(path, data.encode("utf-8"), durable)
 
+
+# For callers that already hold the encoded JSON, e.g. to share one encoding
+# between a per-item file and append_record(encoded=...).
+def atomic_write_bytes(path: Path, data: bytes, *, durable: bool = True) -> None:
+    _atomic_write_bytes(path, data, durable)
+
+
+# Decoded values are cached per path and reused while (inode, mtime_ns, size)
+# is unchanged, so repeat reads cost one stat. The inode catches an atomic
+# replace that lands within one mtime tick at the same size. The returned
+# object is shared: callers must not mutate it. A missing file surfaces as
+# FileNotFoundError from the stat itself, with no separate exists() probe.
 def read_json(path: Path, default: Any) -> Any:
-    if not path.exists():
+    key = str(path)
+    try:
+        stat = os.stat(key)
+    except OSError:
         return default
+    with _json_cache_lock:
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = _json_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            _json_cache.move_to_end(key)
+            return cached[1]
     try:
-        with open(path, "r", encoding="utf-8") as handle:
-            return json.load(handle)
-    except (OSError, json.JSONDecodeError):
+        data = orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
         return default
+    with _json_cache_lock:
+        _json_cache[key] = (stamp, data)
+        _json_cache.move_to_end(key)
+        if len(_json_cache) > _JSON_CACHE_MAX_ENTRIES:
+            _json_cache.popitem(last=False)
+    return data
+
+
+# One lock file per directory guards every JSON list in it. Locking the list
+# itself would race with rewrites that replace its inode by rename.
+def _json_list_lock_path(path: Path) -> Path:
+    return path.parent / ".lock"
+
+
+# append_json_list patches files in place, so readers of those lists take
+# the shared lock to never observe a half-written append. Files written only
+# through atomic_write_* can use read_json directly. The list is a shallow
+# copy, so callers may reorder or extend it without touching the cache.
+def read_json_list(path: Path) -> list:
+    with file_lock(_json_list_lock_path(path), shared=True):
+        data = read_json(path, [])
+    return list(data) if isinstance(data, list) else []
 
 
 def append_json_list(
@@ -125,15 +372,114 @@ def append_json_list(
     item: dict,
     schema_validator: Optional[Callable[[dict], None]] = None,
 ) -> None:
-    lock_path = path.with_suffix(path.suffix + ".lock")
-    with file_lock(lock_path):
-        data = read_json(path, [])
-        if not isinstance(data, list):
-            data = []
-        if schema_validator is not None:
-            schema_validator(item)
-        data.append(item)
-        atomic_write_json(path, data)
+    extend_json_list(path, [item], schema_validator)
+
+
+# Preferred for bulk ingest: the whole batch is validated and encoded up
+# front, then lands under one lock acquisition and one write, instead of
+# one of each per item.
+def extend_json_list(
+    path: Path,
+    items: Iterable[dict],
+    schema_validator: Optional[Callable[[dict], None]] = None,
+) -> None:
+    entries = list(items)
+    if not entries:
+        return
+    # Deprecated for record lists: those live in SQLite, so route the append
+    # there instead of rewriting the whole JSON file.
+    if _RECORD_LISTS.get(path.stem) == path.name:
+        futures = [
+            append_record(path.parent, path.stem, entry, schema_validator) for entry in entries
+        ]
+        for future in futures:
+            future.result()
+        return
+    if schema_validator is not None:
+        for entry in entries:
+            schema_validator(entry)
+    # Encode before taking the lock so concurrent writers only serialise on
+    # the byte patch itself.
+    encoded = b",".join(_dump_record(entry) for entry in entries)
+    key = str(path)
+    with file_lock(_json_list_lock_path(path)):
+        if key in _json_lists_verified and _patch_json_list(path, encoded):
+            return
+        existing, intact = _load_json_list_for_append(path)
+        if intact and existing and _patch_json_list(path, encoded):
+            _json_lists_verified.add(key)
+            return
+        # Missing, empty, or recovered from a torn/foreign file: rewrite it;
+        # skip the fsync and rely on the rename for crash consistency.
+        if existing:
+            atomic_write_json(path, [*existing, *entries], durable=False)
+        else:
+            _atomic_write_bytes(path, b"[" + encoded + b"]", durable=False)
+        _json_lists_verified.add(key)
+
+
+# Returns (items, intact). A file that is not a JSON array is never dropped:
+# a torn append keeps its valid leading array, and anything else is moved
+# aside to "<name>.corrupt" before the caller starts a fresh list.
+def _load_json_list_for_append(path: Path) -> tuple[list, bool]:
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        return [], True
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        data = None
+    if isinstance(data, list):
+        return data, True
+    prefix = _json_list_prefix(raw) if data is None else None
+    if prefix is not None:
+        logger.warning("Recovered {} items from torn JSON list {}", len(prefix), path)
+        return prefix, False
+    corrupt_path = path.with_name(path.name + ".corrupt")
+    os.replace(path, corrupt_path)
+    logger.warning("Moved unreadable JSON list {} aside to {}", path, corrupt_path)
+    return [], False
+
+
+# The array that a torn append leaves intact at the start of the file, if any.
+def _json_list_prefix(raw: bytes) -> Optional[list]:
+    try:
+        text = raw.decode("utf-8").lstrip()
+        data, _ = _JSON_PREFIX_DECODER.raw_decode(text)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    return data if isinstance(data, list) else None
+
+
+# Appends in place in two steps so a torn write never damages the existing
+# array: ",<items>]" is first written after the closing "]" (readers that
+# stop at that "]" still see the old list), and only then is the old "]"
+# overwritten with ",". A crash in between leaves "[...]<junk>", whose
+# leading array _load_json_list_for_append recovers. Returns False when the
+# file does not look like a non-empty JSON array and needs the slow path.
+def _patch_json_list(path: Path, encoded: bytes) -> bool:
+    try:
+        handle = open(path, "r+b")
+    except FileNotFoundError:
+        return False
+    with handle:
+        size = os.fstat(handle.fileno()).st_size
+        if handle.read(1) != b"[":
+            return False
+        tail_start = max(1, size - _JSON_LIST_TAIL_BYTES)
+        handle.seek(tail_start)
+        tail = handle.read().rstrip()
+        if not tail.endswith(b"]") or not tail[:-1].rstrip():
+            return False
+        close_at = tail_start + len(tail) - 1
+        handle.seek(close_at + 1)
+        handle.write(encoded + b"]")
+        handle.truncate()
+        handle.flush()
+        handle.seek(close_at)
+        handle.write(b",")
+    return True
 
 
 def write_json_list(
@@ -141,45 +487,194 @@ def write_json_list(
     items: Iterable[dict],
     schema_validator: Optional[Callable[[dict], None]] = None,
 ) -> None:
+    # Materialise once: validating a generator would otherwise exhaust it
+    # before the write and persist an empty list.
+    entries = list(items)
     if schema_validator is not None:
-        for entry in items:
+        for entry in entries:
             schema_validator(entry)
-    atomic_write_json(path, list(items))
+    atomic_write_json(path, entries)
 
 
 def list_snapshot_files(root: Path) -> list[Path]:
-    global _snapshot_cache_root, _snapshot_cache_ts, _snapshot_cache_files
+    return [path for _, path in list_snapshot_files_with_mtime(root)]
+
+
+# (mtime, path) pairs sorted oldest first, so callers can order or filter by
+# age without stat-ing every file again. Once the TTL lapses the cached list is
+# still reused if no directory in the tree has a new mtime, which costs one
+# stat per directory instead of a full walk.
+def list_snapshot_files_with_mtime(root: Path) -> list[tuple[float, Path]]:
+    global _snapshot_cache_root, _snapshot_cache_ts
+    global _snapshot_cache_entries, _snapshot_cache_dir_mtimes
     now = time.time()
+    dir_mtimes: dict[str, float] = {}
+    cold = True
     with _snapshot_cache_lock:
-        if (
-            _snapshot_cache_root == root
-            and now - _snapshot_cache_ts < _SNAPSHOT_CACHE_TTL_SEC
-        ):
-            return list(_snapshot_cache_files)
-    if not root.exists():
+        if _snapshot_cache_root == root:
+            if now - _snapshot_cache_ts < _SNAPSHOT_CACHE_TTL_SEC:
+                return list(_snapshot_cache_entries)
+            cold = False
+            dir_mtimes = _snapshot_cache_dir_mtimes
+            entries = _snapshot_cache_entries
+    if cold:
+        # First call in this process: the index saved by a previous run is
+        # validated the same way as the in-memory cache.
+        dir_mtimes, entries = _load_snapshot_index(root)
+    if dir_mtimes and _snapshot_dirs_unchanged(dir_mtimes):
+        with _snapshot_cache_lock:
+            _snapshot_cache_root = root
+            _snapshot_cache_ts = now
+            _snapshot_cache_entries = entries
+            _snapshot_cache_dir_mtimes = dir_mtimes
+        return list(entries)
+    dir_mtimes = {}
+    # Sort plain (mtime, str) tuples and build Path objects once afterwards.
+    entries = [(mtime, Path(path)) for mtime, path in sorted(_scan_snapshot_tree(root, dir_mtimes))]
+    if str(root) not in dir_mtimes:
+        # Root missing or unreadable: nothing worth caching.
         return []
-    files = [p for p in root.rglob('*.jpg') if p.is_file()]
-    files.extend([p for p in root.rglob('*.jpeg') if p.is_file()])
-    files.extend([p for p in root.rglob('*.png') if p.is_file()])
-    files = [p for p in files if not p.name.endswith('.tmp')]
-    files.sort(key=lambda p: p.stat().st_mtime)
+    # A directory modified within timestamp granularity of the scan could
+    # change again without its mtime moving; rescan next time instead.
+    settle_before = now - _SNAPSHOT_DIR_MTIME_SLACK_SEC
+    if any(mtime >= settle_before for mtime in dir_mtimes.values()):
+        dir_mtimes = {}
+    else:
+        _save_snapshot_index(root, dir_mtimes, entries)
     with _snapshot_cache_lock:
         _snapshot_cache_root = root
         _snapshot_cache_ts = now
-        _snapshot_cache_files = files
-    return list(files)
+        _snapshot_cache_entries = entries
+        _snapshot_cache_dir_mtimes = dir_mtimes
+    return list(entries)
+
+
+# The index sits beside the root rather than inside it, since writing it
+# into the tree would bump the root mtime and invalidate itself.
+def _snapshot_index_path(root: Path) -> Path:
+    return root.parent / f".{root.name}_index.json"
+
+
+def _load_snapshot_index(root: Path) -> tuple[dict[str, float], list[tuple[float, Path]]]:
+    data = read_json(_snapshot_index_path(root), None)
+    if (
+        not isinstance(data, dict)
+        or data.get("version") != _SNAPSHOT_INDEX_VERSION
+        or data.get("root") != str(root)
+    ):
+        return {}, []
+    try:
+        dir_mtimes = dict(data["dirs"])
+        entries = [(mtime, Path(path)) for mtime, path in data["entries"]]
+    except (KeyError, TypeError, ValueError):
+        return {}, []
+    return dir_mtimes, entries
+
+
+def _save_snapshot_index(
+    root: Path, dir_mtimes: dict[str, float], entries: list[tuple[float, Path]]
+) -> None:
+    payload = {
+        "version": _SNAPSHOT_INDEX_VERSION,
+        "root": str(root),
+        "dirs": dir_mtimes,
+        "entries": [(mtime, str(path)) for mtime, path in entries],
+    }
+    try:
+        atomic_write_json(_snapshot_index_path(root), payload, durable=False, compact=True)
+    except OSError as exc:
+        logger.warning("Failed to save snapshot index: {error}", error=str(exc))
+
 
+def _snapshot_dirs_unchanged(dir_mtimes: dict[str, float]) -> bool:
+    for path, mtime in dir_mtimes.items():
+        try:
+            if os.stat(path).st_mtime != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+# Directories are read on a small pool so readdir latency on slow storage
+# (NAS, spinning disks) overlaps: each finished directory immediately queues
+# its subdirectories. DirEntry caches the stat result, so each file costs one
+# readdir entry plus at most one stat.
+def _scan_snapshot_tree(root: Path, dir_mtimes: dict[str, float]) -> list[tuple[float, str]]:
+    results: list[tuple[float, str]] = []
+    with ThreadPoolExecutor(max_workers=_SNAPSHOT_SCAN_WORKERS) as pool:
+        pending = {pool.submit(_scan_snapshot_dir, str(root)): str(root)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_path = pending.pop(future)
+                try:
+                    dir_mtime, files, subdirs = future.result()
+                except OSError:
+                    continue
+                dir_mtimes[dir_path] = dir_mtime
+                results.extend(files)
+                for subdir in subdirs:
+                    pending[pool.submit(_scan_snapshot_dir, subdir)] = subdir
+    return results
+
+
+# The directory mtime is read before its entries so a concurrent change is
+# never hidden behind an up-to-date mtime.
+def _scan_snapshot_dir(dir_path: str) -> tuple[float, list[tuple[float, str]], list[str]]:
+    dir_mtime = os.stat(dir_path).st_mtime
+    files = []
+    subdirs = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                name = entry.name
+                if name.rpartition(".")[2].lower() not in _SNAPSHOT_EXTENSIONS:
+                    continue
+                if not entry.is_file():
+                    continue
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+    return dir_mtime, files, subdirs
+
+
+# Startups find the file already written, so a plain read is the whole cost.
+# Otherwise the bytes are fsynced in a temp file and published with os.link,
+# which is create-only, so the version file never exists half-written. An
+# existing empty file is a torn leftover and is replaced. Filesystems that
+# refuse hard links (e.g. Windows-host bind mounts) publish by rename instead.
 def write_schema_version(data_dir: Path, version: str) -> None:
-    version_path = data_dir / "schema_version.txt"
-    if version_path.exists():
+    if read_schema_version(data_dir):
         return
-    atomic_write_text(version_path, version)
+    version_path = data_dir / "schema_version.txt"
+    ensure_dir(data_dir)
+    tmp_path = data_dir / f"schema_version.txt.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, _ATOMIC_WRITE_FLAGS, 0o644)
+    try:
+        try:
+            _write_all(fd, version.encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        try:
+            os.link(tmp_path, version_path)
+        except FileExistsError:
+            if read_schema_version(data_dir):
+                return
+            os.replace(tmp_path, version_path)
+        except OSError:
+            os.replace(tmp_path, version_path)
+        _fsync_dir(data_dir)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def read_schema_version(data_dir: Path) -> Optional[str]:
     version_path = data_dir / "schema_version.txt"
-    if not version_path.exists():
-        return None
     try:
         return version_path.read_text(encoding="utf-8").strip()
     except OSError:
@@ -191,7 +686,9 @@ def read_last_processed(path: Path) -> dict:
 
 
 def write_last_processed(path: Path, data: dict) -> None:
-    atomic_write_json(path, data)
+    # Rewritten after every snapshot; losing the newest value on power loss
+    # only means recent snapshots are processed again.
+    atomic_write_json(path, data, durable=False, compact=True)
 
 def _record_db_path(data_dir: Path) -> Path:
     return data_dir / _RECORD_DB_NAME
@@ -214,20 +711,49 @@ def _run_sqlite_with_retry(action: Callable[[], T], attempts: int = 6) -> T:
     raise RuntimeError("unreachable")  # pragma: no cover
 
 
-@contextmanager
-def _record_db_conn(db_path: Path):
+def _get_record_conn(db_path: Path) -> sqlite3.Connection:
+    conns = getattr(_record_conn_local, "conns", None)
+    if conns is None:
+        conns = _record_conn_local.conns = {}
+    key = str(db_path)
+    conn = conns.get(key)
+    if conn is not None:
+        return conn
     conn = _run_sqlite_with_retry(
-        lambda: sqlite3.connect(str(db_path), timeout=_RECORD_DB_TIMEOUT_SEC)
+        lambda: sqlite3.connect(key, timeout=_RECORD_DB_TIMEOUT_SEC, check_same_thread=False)
     )
+    conn.execute(f"PRAGMA busy_timeout={_RECORD_DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conns[key] = conn
+    with _record_conns_lock:
+        _record_conns.append(conn)
+    return conn
+
+
+@atexit.register
+def _close_record_conns() -> None:
+    with _record_conns_lock:
+        conns = list(_record_conns)
+        _record_conns.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+@contextmanager
+def _record_db_conn(db_path: Path):
+    # Connections are cached per thread and per database for the process
+    # lifetime; each use is still its own committed transaction.
+    conn = _get_record_conn(db_path)
     try:
-        conn.execute(f"PRAGMA busy_timeout={_RECORD_DB_BUSY_TIMEOUT_MS}")
         yield conn
         conn.commit()
     except Exception:  # noqa: BLE001
         conn.rollback()
         raise
-    finally:
-        conn.close()
 
 
 def _init_record_db_pragmas(conn: sqlite3.Connection) -> None:
@@ -284,12 +810,18 @@ def _parse_iso_epoch(value: Optional[str]) -> Optional[float]:
     if not value:
         return None
     try:
-        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        parsed = datetime.fromisoformat(value)
         return parsed.timestamp()
     except ValueError:
         return None
 
 
+# Payloads are stored as UTF-8 JSON blobs; older TEXT rows still decode since
+# orjson.loads accepts both.
+def _dump_record(item: Any) -> bytes:
+    return orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS)
+
+
 def _maybe_migrate_record_list(data_dir: Path, list_name: str) -> None:
     if list_name not in _RECORD_LISTS:
         return
@@ -309,25 +841,38 @@ def _maybe_migrate_record_list(data_dir: Path, list_name: str) -> None:
         ).fetchone()
         if row:
             return
-        items = read_json(json_path, [])
-        if not isinstance(items, list) or not items:
+        try:
+            json_text = json_path.read_text(encoding="utf-8")
+        except OSError:
             return
-        rows = []
-        for item in items:
-            ts_value = None
-            if isinstance(item, dict):
-                ts_value = item.get("timestamp") or item.get("ts")
-            ts_epoch = _parse_iso_epoch(ts_value) if ts_value else None
-            try:
-                payload = json.dumps(item, ensure_ascii=True)
-            except TypeError:
-                continue
-            rows.append((list_name, ts_value, ts_epoch, payload))
-        if rows:
-            conn.executemany(
-                "INSERT INTO records (list_name, timestamp, timestamp_epoch, data) VALUES (?, ?, ?, ?)",
-                rows,
-            )
+        try:
+            if conn.execute("SELECT json_type(?)", (json_text,)).fetchone()[0] != "array":
+                return
+            conn.execute(_MIGRATE_RECORDS_SQL, (list_name, json_text))
+        except sqlite3.OperationalError as exc:
+            if _is_sqlite_locked(exc):
+                raise
+            # No JSON1 support (or JSON SQLite rejects): parse in Python.
+            _migrate_record_rows(conn, list_name, read_json(json_path, []))
+
+
+def _migrate_record_rows(conn: sqlite3.Connection, list_name: str, items: Any) -> None:
+    if not isinstance(items, list) or not items:
+        return
+    rows = []
+    for item in items:
+        # Only dicts are stored so readers can skip per-row type checks.
+        if not isinstance(item, dict):
+            continue
+        ts_value = item.get("timestamp") or item.get("ts")
+        ts_epoch = _parse_iso_epoch(ts_value) if ts_value else None
+        try:
+            payload = _dump_record(item)
+        except TypeError:
+            continue
+        rows.append((list_name, ts_value, ts_epoch, payload))
+    if rows:
+        conn.executemany(_RECORD_INSERT_SQL, rows)
 
 
 def append_record(
@@ -335,19 +880,99 @@ def append_record(
     list_name: str,
     item: dict,
     schema_validator: Optional[Callable[[dict], None]] = None,
-) -> None:
+    encoded: Optional[bytes] = None,
+) -> Future:
+    if not isinstance(item, dict):
+        raise TypeError(f"record must be a dict, got {type(item).__name__}")
     if schema_validator is not None:
         schema_validator(item)
     _maybe_migrate_record_list(data_dir, list_name)
     db_path = _init_record_db(data_dir)
     ts_value = item.get("timestamp") or item.get("ts")
     ts_epoch = _parse_iso_epoch(ts_value) if ts_value else None
-    payload = json.dumps(item, ensure_ascii=True)
-    with _record_db_conn(db_path) as conn:
-        conn.execute(
-            "INSERT INTO records (list_name, timestamp, timestamp_epoch, data) VALUES (?, ?, ?, ?)",
-            (list_name, ts_value, ts_epoch, payload),
-        )
+    # encoded, when given, must be the JSON encoding of item.
+    payload = encoded if encoded is not None else _dump_record(item)
+    return _enqueue_record_write(str(db_path), (list_name, ts_value, ts_epoch, payload))
+
+
+# The returned future resolves once the row is committed, or carries the
+# error if its batch failed. Callers that must not lose the row (e.g. before
+# advancing last_processed) wait on it; others may drop it.
+def _enqueue_record_write(db_key: str, row: tuple) -> Future:
+    global _record_pending_writes, _record_writer_thread
+    future: Future = Future()
+    with _record_pending_cond:
+        _record_pending_writes += 1
+    with _record_writer_lock:
+        if _record_writer_thread is None or not _record_writer_thread.is_alive():
+            _record_writer_thread = threading.Thread(
+                target=_record_writer_loop, name="record-writer", daemon=True
+            )
+            _record_writer_thread.start()
+    _record_write_queue.put((db_key, row, future))
+    return future
+
+
+def _record_writer_loop() -> None:
+    while True:
+        batch = [_record_write_queue.get()]
+        deadline = time.monotonic() + _RECORD_WRITE_LINGER_SEC
+        while len(batch) < _RECORD_WRITE_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_record_write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_record_batch(batch)
+
+
+def _write_record_batch(batch: list[tuple[str, tuple, Future]]) -> None:
+    global _record_pending_writes
+    by_db: dict[str, tuple[list[tuple], list[Future]]] = {}
+    for db_key, row, future in batch:
+        rows, futures = by_db.setdefault(db_key, ([], []))
+        rows.append(row)
+        futures.append(future)
+    try:
+        for db_key, (rows, futures) in by_db.items():
+            try:
+                _run_sqlite_with_retry(lambda: _insert_record_rows(Path(db_key), rows))
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Failed to write {} record(s) for {}: {}", len(rows), db_key, exc)
+                for future in futures:
+                    future.set_exception(exc)
+            else:
+                for future in futures:
+                    future.set_result(None)
+    finally:
+        with _record_pending_cond:
+            _record_pending_writes -= len(batch)
+            _record_pending_cond.notify_all()
+
+
+def _insert_record_rows(db_path: Path, rows: list[tuple]) -> None:
+    # One transaction per batch so a burst of appends shares a single commit.
+    conn = _get_record_conn(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(_RECORD_INSERT_SQL, rows)
+    except Exception:  # noqa: BLE001
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# Blocks until every append queued so far is committed. Readers call this so
+# they always observe their own writes.
+def flush_records(timeout: Optional[float] = None) -> bool:
+    with _record_pending_cond:
+        return _record_pending_cond.wait_for(lambda: _record_pending_writes == 0, timeout)
+
+
+# Registered after _close_record_conns so it runs first at interpreter exit.
+atexit.register(flush_records, _RECORD_DB_TIMEOUT_SEC)
 
 
 def fetch_records(
@@ -357,6 +982,7 @@ def fetch_records(
     offset: int = 0,
     newest_first: bool = False,
 ) -> list[dict]:
+    flush_records()
     _maybe_migrate_record_list(data_dir, list_name)
     db_path = _init_record_db(data_dir)
     order = "DESC" if newest_first else "ASC"
@@ -370,41 +996,129 @@ def fetch_records(
         params.append(max(0, offset))
     with _record_db_conn(db_path) as conn:
         rows = conn.execute(query, params).fetchall()
+    return _decode_records(rows)
+
+
+# Writers only store dicts, so decode in one comprehension and fall back to
+# the filtering loop only if a row is corrupt.
+def _decode_records(rows: list[tuple]) -> list[dict]:
+    try:
+        return [orjson.loads(payload) for (payload,) in rows]
+    except orjson.JSONDecodeError:
+        pass
     items = []
     for (payload,) in rows:
         try:
-            data = json.loads(payload)
-        except json.JSONDecodeError:
+            data = orjson.loads(payload)
+        except orjson.JSONDecodeError:
             continue
         if isinstance(data, dict):
             items.append(data)
     return items
 
 
+def record_list_version(data_dir: Path, list_name: str) -> tuple[int, int]:
+    flush_records()
+    _maybe_migrate_record_list(data_dir, list_name)
+    db_path = _init_record_db(data_dir)
+    with _record_db_conn(db_path) as conn:
+        row = conn.execute(
+            "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM records WHERE list_name = ?",
+            (list_name,),
+        ).fetchone()
+    return (int(row[0]), int(row[1])) if row else (0, 0)
+
+
 def fetch_records_since(
     data_dir: Path,
     list_name: str,
     cutoff: datetime,
+    until: Optional[datetime] = None,
+    newest: Optional[int] = None,
 ) -> list[dict]:
+    db_path = _prepare_record_read(data_dir, list_name)
+    if newest is None:
+        query, params = _records_since_query(list_name, cutoff, until)
+    else:
+        # Only the newest rows are wanted: walk the epoch index backwards and
+        # stop after `newest`, so older rows in the range are never decoded.
+        order = "timestamp_epoch DESC, id DESC"
+        query, params = _records_since_query(list_name, cutoff, until, order)
+        query += " LIMIT ?"
+        params.append(max(0, newest))
+    with _record_db_conn(db_path) as conn:
+        rows = conn.execute(query, params).fetchall()
+    if newest is not None:
+        rows.reverse()
+    return _decode_records(rows)
+
+
+# Streaming variant for single-pass aggregations: rows are fetched and decoded
+# a batch at a time, so memory stays bounded by the batch rather than the range.
+def iter_records_since(
+    data_dir: Path,
+    list_name: str,
+    cutoff: datetime,
+    until: Optional[datetime] = None,
+) -> Iterator[dict]:
+    db_path = _prepare_record_read(data_dir, list_name)
+    query, params = _records_since_query(list_name, cutoff, until)
+    with _record_db_conn(db_path) as conn:
+        cursor = conn.execute(query, params)
+        while rows := cursor.fetchmany(_RECORD_STREAM_BATCH_ROWS):
+            yield from _decode_records(rows)
+
+
+def _prepare_record_read(data_dir: Path, list_name: str) -> Path:
+    flush_records()
     _maybe_migrate_record_list(data_dir, list_name)
-    db_path = _init_record_db(data_dir)
-    cutoff_epoch = cutoff.timestamp()
+    return _init_record_db(data_dir)
+
+
+# Bound the range on the indexed epoch column so rows outside it are never
+# decoded.
+def _records_since_query(
+    list_name: str, cutoff: datetime, until: Optional[datetime], order: str = "id ASC"
+) -> tuple[str, list[Any]]:
     query = (
         "SELECT data FROM records "
         "WHERE list_name = ? AND timestamp_epoch IS NOT NULL AND timestamp_epoch >= ? "
-        "ORDER BY id ASC"
     )
-    with _record_db_conn(db_path) as conn:
-        rows = conn.execute(query, (list_name, cutoff_epoch)).fetchall()
-    items = []
-    for (payload,) in rows:
-        try:
-            data = json.loads(payload)
-        except json.JSONDecodeError:
-            continue
-        if isinstance(data, dict):
-            items.append(data)
-    return items
+    params: list[Any] = [list_name, cutoff.timestamp()]
+    if until is not None:
+        query += "AND timestamp_epoch <= ? "
+        params.append(until.timestamp())
+    query += "ORDER BY " + order
+    return query, params
+
+
+# Groups usage rows by provider and UTC day inside SQLite so summaries never
+# decode payloads in Python. CAST keeps json_extract reading blob payloads
+# as JSON text.
+_USAGE_TOTALS_SQL = (
+    "SELECT COALESCE(json_extract(payload, '$.provider'), 'unknown'), "
+    "strftime('%Y-%m-%d', timestamp_epoch, 'unixepoch'), "
+    "TOTAL(json_extract(payload, '$.input_tokens')), "
+    "TOTAL(json_extract(payload, '$.output_tokens')), "
+    "TOTAL(json_extract(payload, '$.total_tokens')), "
+    "TOTAL(json_extract(payload, '$.cost_usd')) "
+    "FROM (SELECT timestamp_epoch, CAST(data AS TEXT) AS payload FROM records "
+    "WHERE list_name = 'usage' AND timestamp_epoch IS NOT NULL AND timestamp_epoch >= ?) "
+    "GROUP BY 1, 2"
+)
+
+
+# Returns (provider, day, input, output, total, cost) rows, or None when the
+# SQLite build lacks JSON1 and callers must aggregate decoded records.
+def usage_totals_since(data_dir: Path, cutoff: datetime) -> Optional[list[tuple]]:
+    db_path = _prepare_record_read(data_dir, "usage")
+    try:
+        with _record_db_conn(db_path) as conn:
+            return conn.execute(_USAGE_TOTALS_SQL, (cutoff.timestamp(),)).fetchall()
+    except sqlite3.OperationalError as exc:
+        if _is_sqlite_locked(exc):
+            raise
+        return None
 
 
 def prune_records(
@@ -413,6 +1127,7 @@ def prune_records(
     cutoff: datetime,
     dry_run: bool = False,
 ) -> int:
+    flush_records()
     _maybe_migrate_record_list(data_dir, list_name)
     db_path = _init_record_db(data_dir)
     cutoff_epoch = cutoff.timestamp()
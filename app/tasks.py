@@ -1,28 +1,55 @@
-﻿import base64
+﻿import binascii
 import json
+import os
 import re
 import subprocess
+import threading
 import time
-from collections import Counter
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta, timezone, time as dt_time
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 import httpx
+import orjson
 from loguru import logger
 
 from . import prompts, storage
-from .image_validator import diff_percent, is_dark_frame, validate_image
+from .image_validator import (
+    diff_percent,
+    hamming_distance,
+    image_hash,
+    is_dark_frame,
+    validate_image,
+)
 from .rate_limiter import RateLimiter
-from .usage import record_usage
+from .usage import ISO_Z_FORMAT, _parse_iso, record_usage
 
 GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
 RTSP_CAPTURE_TIMEOUT_SEC = 30
-
-
+_SNAPSHOT_STEM_RE = re.compile(r"(\d{2})(\d{2})(\d{2})")
+_SENTENCE_SPLIT_RE = re.compile(r"[.!?]+")
+_JSON_DECODER = json.JSONDecoder()
+_WINDOW_MTIME_SLACK_SEC = 3600
+_MIN_UTC = datetime.min.replace(tzinfo=timezone.utc)
+# Multiple of 3 so every chunk encodes without mid-stream padding.
+_BASE64_CHUNK_BYTES = 3 * 64 * 1024
+_IMAGE_CACHE_MAX_ENTRIES = 64
+_IMAGE_CACHE_MAX_CHARS = 64 * 1024 * 1024
+_image_cache_lock = threading.Lock()
+_image_cache: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+_image_cache_chars = 0
+
+
+# time.strftime over gmtime() formats in one C call, about 3x faster than
+# building a datetime, trimming microseconds and rewriting the offset.
 def now_utc_iso() -> str:
-    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    return time.strftime(ISO_Z_FORMAT, time.gmtime())
 
 
 def local_timestamp(settings) -> datetime:
@@ -35,45 +62,100 @@ def build_snapshot_path(settings, dt_local: datetime) -> Path:
     return settings.snapshots_dir / rel_dir / filename
 
 
-def ensure_stable_file(path: Path, attempts: int = 3, delay: float = 0.5) -> bool:
+# size is an already-known first reading, saving the initial stat.
+def ensure_stable_file(
+    path: Path, attempts: int = 3, delay: float = 0.5, size: Optional[int] = None
+) -> bool:
     last_size = -1
-    for _ in range(attempts):
-        try:
-            size = path.stat().st_size
-        except OSError:
-            return False
+    for attempt in range(attempts):
+        if size is None:
+            try:
+                size = path.stat().st_size
+            except OSError:
+                return False
         if size == last_size and size > 0:
             return True
         last_size = size
-        time.sleep(delay)
+        size = None
+        # No reading follows the last attempt, so sleeping there only adds latency.
+        if attempt + 1 < attempts:
+            time.sleep(delay)
     return False
 
 
+def _image_mime(path: Path) -> str:
+    return "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+
+
 def encode_image(path: Path) -> tuple[str, str]:
-    mime = "image/jpeg"
-    suffix = path.suffix.lower()
-    if suffix == ".png":
-        mime = "image/png"
+    return _image_mime(path), _cached_base64(path)
+
+
+def encode_image_data_url(path: Path) -> str:
+    return f"data:{_image_mime(path)};base64,{_cached_base64(path)}"
+
+
+# The same snapshot is sent to Groq for a description and then to Gemini in
+# several compares, so encodings are kept while (mtime_ns, size) still match.
+# Bounded by entry count and total size, evicting least recently used.
+def _cached_base64(path: Path) -> str:
+    global _image_cache_chars
+    stat = os.stat(path)
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _image_cache_lock:
+        data = _image_cache.get(key)
+        if data is not None:
+            _image_cache.move_to_end(key)
+            return data
+    data = _encode_base64_file(path)
+    with _image_cache_lock:
+        if key not in _image_cache:
+            _image_cache[key] = data
+            _image_cache_chars += len(data)
+            while len(_image_cache) > 1 and (
+                len(_image_cache) > _IMAGE_CACHE_MAX_ENTRIES
+                or _image_cache_chars > _IMAGE_CACHE_MAX_CHARS
+            ):
+                _, evicted = _image_cache.popitem(last=False)
+                _image_cache_chars -= len(evicted)
+    return data
+
+
+# Encodes chunk by chunk into one buffer sized from fstat, so the raw image
+# is never held whole next to its base64 text; the only full-size copies are
+# the buffer and the final str.
+def _encode_base64_file(path: Path) -> str:
     with open(path, "rb") as handle:
-        data = base64.b64encode(handle.read()).decode("ascii")
-    return mime, data
+        size = os.fstat(handle.fileno()).st_size
+        out = bytearray((size + 2) // 3 * 4)
+        pos = 0
+        while chunk := handle.read(_BASE64_CHUNK_BYTES):
+            encoded = binascii.b2a_base64(chunk, newline=False)
+            out[pos : pos + len(encoded)] = encoded
+            pos += len(encoded)
+    # The file may have changed size since the fstat.
+    del out[pos:]
+    return out.decode("ascii")
 
 
 def safe_truncate(text: str, limit: int = 200) -> str:
     cleaned = " ".join(text.strip().split())
     if len(cleaned) <= limit:
         return cleaned
-    sentences = [s.strip() for s in cleaned.replace("!", ".").replace("?", ".").split(".")]
+    # Track the joined length instead of re-joining on every sentence.
     result = []
-    for sentence in sentences:
+    length = 0
+    for sentence in _SENTENCE_SPLIT_RE.split(cleaned):
+        sentence = sentence.strip()
         if not sentence:
             continue
-        candidate = ". ".join(result + [sentence])
-        if len(candidate) + 1 > limit:
+        added = len(sentence) + (2 if result else 0)
+        if length + added + 1 > limit:
             break
         result.append(sentence)
+        length += added
     if result:
-        return ". ".join(result).rstrip(".") + "."
+        return ". ".join(result) + "."
     truncated = cleaned[:limit]
     if " " in truncated:
         truncated = truncated.rsplit(" ", 1)[0]
@@ -106,6 +188,21 @@ def _call_with_retry(limiter: RateLimiter, provider: str, max_attempts: int, fun
     return None, last_latency, last_exc
 
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+# Payloads carry multi-megabyte base64 images; orjson encodes them in one
+# pass, where httpx's json= goes through the stdlib encoder.
+def _post_json(client: httpx.Client, url: str, payload: dict, timeout: float) -> httpx.Response:
+    return client.post(url, content=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=timeout)
+
+
+# orjson decodes the raw body directly; resp.json() would decode to str and
+# then run the stdlib parser.
+def _response_json(resp: httpx.Response) -> Any:
+    return orjson.loads(resp.content)
+
+
 def _extract_openai_usage(payload: dict) -> dict[str, int]:
     usage = payload.get("usage", {}) if isinstance(payload, dict) else {}
     return {
@@ -130,11 +227,21 @@ def _extract_gemini_usage(payload: dict) -> dict[str, int]:
 def _extract_json_object(text: str) -> dict | None:
     if not text:
         return None
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if not match:
+    start = text.find("{")
+    if start < 0:
+        return None
+    end = text.rfind("}")
+    if end <= start:
         return None
+    # Model replies are usually one object, possibly wrapped in prose; orjson
+    # parses that span directly. A valid span is exactly the first object.
     try:
-        return json.loads(match.group(0))
+        return orjson.loads(text[start : end + 1])
+    except orjson.JSONDecodeError:
+        pass
+    # Trailing braces after the first object: raw_decode stops at its end.
+    try:
+        return _JSON_DECODER.raw_decode(text, start)[0]
     except json.JSONDecodeError:
         return None
 
@@ -149,25 +256,23 @@ def _normalize_tags(data: dict | None) -> dict[str, list[str]]:
             values = [values]
         if not isinstance(values, list):
             continue
-        cleaned = []
-        for value in values:
-            if not isinstance(value, str):
-                continue
-            item = value.strip().lower()
-            if item and item not in cleaned:
-                cleaned.append(item)
-        tags[key] = cleaned
+        # dict.fromkeys dedupes in O(n) and keeps first-seen order.
+        cleaned = dict.fromkeys(
+            item
+            for item in (value.strip().lower() for value in values if isinstance(value, str))
+            if item
+        )
+        tags[key] = list(cleaned)
     return tags
 
 
 def _format_tags_summary(tags: dict[str, list[tuple[str, int]]]) -> str:
-    parts = []
-    for key, items in tags.items():
-        if not items:
-            continue
-        formatted = ", ".join([f"{label}({count})" for label, count in items])
-        parts.append(f"{key}: {formatted}")
-    return "; ".join(parts) if parts else "none"
+    summary = "; ".join(
+        f"{key}: " + ", ".join(f"{label}({count})" for label, count in items)
+        for key, items in tags.items()
+        if items
+    )
+    return summary or "none"
 
 
 def _format_tags_compact(tags: dict | None) -> str:
@@ -180,7 +285,7 @@ def _format_tags_compact(tags: dict | None) -> str:
             values = [values]
         if not isinstance(values, list):
             continue
-        cleaned = [v.strip() for v in values if isinstance(v, str) and v.strip()]
+        cleaned = [value for v in values if isinstance(v, str) and (value := v.strip())]
         if cleaned:
             parts.append(f"{key}: {', '.join(cleaned[:4])}")
     return "; ".join(parts) if parts else "none"
@@ -191,15 +296,16 @@ def _build_ask_context(
     settings,
     max_items: int,
 ) -> tuple[str, int, str, str]:
-    sorted_items = sorted(
-        items,
-        key=lambda item: _parse_iso(item.get("timestamp")) or datetime.min.replace(tzinfo=timezone.utc),
-    )
-    sliced = sorted_items[-max_items:] if max_items > 0 else sorted_items
+    # Parse each timestamp once and carry it with the item. Records arrive in
+    # time order from SQLite, so this sort is a single linear Timsort pass.
+    decorated = [(_parse_iso(item.get("timestamp")), item) for item in items]
+    decorated.sort(key=lambda pair: pair[0] or _MIN_UTC)
+    if max_items > 0:
+        decorated = decorated[-max_items:]
+    sliced = [item for _, item in decorated]
     lines = []
     timestamps = []
-    for item in sliced:
-        ts = _parse_iso(item.get("timestamp"))
+    for ts, item in decorated:
         if ts:
             timestamps.append(ts)
             local_ts = ts.astimezone(settings.tz).strftime("%Y-%m-%d %H:%M")
@@ -338,7 +444,7 @@ def _parse_story_response(text: str) -> list[str]:
     if isinstance(data, dict):
         bullets = data.get("bullets")
         if isinstance(bullets, list):
-            cleaned = [str(item).strip() for item in bullets if str(item).strip()]
+            cleaned = [line for item in bullets if (line := str(item).strip())]
             if cleaned:
                 return cleaned
     lines = [line.strip("- ").strip() for line in text.splitlines()]
@@ -374,6 +480,22 @@ class TaskRunner:
         self.last_seen_path: Optional[Path] = None
         self.last_preview_path: Optional[Path] = None
         self.last_preview_time = 0.0
+        # Long-lived clients keep connections alive across calls and retries,
+        # so each request skips the DNS lookup and TLS handshake. Timeouts stay
+        # per request.
+        self._groq_client = httpx.Client(
+            base_url=GROQ_BASE_URL,
+            timeout=60,
+            headers={"Authorization": f"Bearer {settings.groq_api_key}"},
+        )
+        self._gemini_client = httpx.Client(timeout=60, params={"key": settings.google_api_key})
+        self._camera_client = httpx.Client(timeout=30)
+        self._finish_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-finish")
+
+    def close(self) -> None:
+        self._finish_pool.shutdown(wait=True)
+        for client in (self._groq_client, self._gemini_client, self._camera_client):
+            client.close()
 
     def _capture_http(self, target: Path) -> Optional[Path]:
         if not self.settings.camera_http_url:
@@ -382,16 +504,14 @@ class TaskRunner:
         target.parent.mkdir(parents=True, exist_ok=True)
         temp_path = target.with_suffix(".tmp")
         try:
-            with httpx.Client(timeout=30) as client:
-                resp = client.get(self.settings.camera_http_url)
-                resp.raise_for_status()
-                temp_path.write_bytes(resp.content)
+            resp = self._camera_client.get(self.settings.camera_http_url)
+            resp.raise_for_status()
+            temp_path.write_bytes(resp.content)
             temp_path.replace(target)
             return target
         except Exception as exc:  # noqa: BLE001
             logger.error("HTTP capture failed: {error}", error=str(exc))
-            if temp_path.exists():
-                temp_path.unlink(missing_ok=True)
+            temp_path.unlink(missing_ok=True)
             return None
 
     def _capture_rtsp(self, target: Path) -> Optional[Path]:
@@ -425,13 +545,11 @@ class TaskRunner:
             return target
         except subprocess.TimeoutExpired:
             logger.error("RTSP capture timed out after {seconds}s", seconds=RTSP_CAPTURE_TIMEOUT_SEC)
-            if temp_path.exists():
-                temp_path.unlink(missing_ok=True)
+            temp_path.unlink(missing_ok=True)
             return None
         except Exception as exc:  # noqa: BLE001
             logger.error("RTSP capture failed: {error}", error=str(exc))
-            if temp_path.exists():
-                temp_path.unlink(missing_ok=True)
+            temp_path.unlink(missing_ok=True)
             return None
 
     def capture_snapshot_http(self) -> Optional[Path]:
@@ -466,51 +584,129 @@ class TaskRunner:
         return captured
 
     def process_snapshot(self, path: Path) -> None:
-        lock_path = self.settings.run_dir / "processing.lock"
-        with storage.file_lock(lock_path):
-            if not path.exists():
-                return
-            if not ensure_stable_file(path):
+        self._dispatch_screened([(path, self._screen_snapshot(path))], raise_errors=True)
+
+    def process_snapshot_batch(self, paths: list[Path]) -> None:
+        screened = []
+        for path in paths:
+            try:
+                screened.append((path, self._screen_snapshot(path)))
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Processing failed for {path}: {error}", path=str(path), error=str(exc))
+        self._dispatch_screened(screened, raise_errors=False)
+
+    # Local checks (stability, validation, dark frame, motion) need no lock.
+    # Returns None to drop the snapshot, ("skip", timestamp) when motion is
+    # below threshold, or ("describe", None) when it needs the model calls.
+    def _screen_snapshot(self, path: Path) -> Optional[tuple[str, Optional[str]]]:
+        # One stat serves the existence check, the first stability reading and
+        # the size limit.
+        try:
+            file_size = os.stat(path).st_size
+        except OSError:
+            return None
+        # http/rtsp captures arrive by atomic rename and are complete when seen;
+        # only files dropped by the Windows host can still be growing.
+        if self.settings.camera_source == "windows-host":
+            if not ensure_stable_file(path, size=file_size):
                 logger.warning("Snapshot file not stable yet: {path}", path=str(path))
-                return
-            valid, reason = validate_image(path, self.settings)
-            if not valid:
-                logger.warning("Invalid image {path}: {reason}", path=str(path), reason=reason)
-                return
-            if self.settings.dark_frame_check and is_dark_frame(path):
-                logger.warning("Dark frame detected, skipping: {path}", path=str(path))
-                return
-
-            previous_path = self.last_seen_path
-            self.last_seen_path = path
-
-            if (
-                self.settings.motion_detection_enabled
-                and previous_path
-                and previous_path.exists()
-            ):
+                return None
+            file_size = None
+        valid, reason = validate_image(path, self.settings, file_size)
+        if not valid:
+            logger.warning("Invalid image {path}: {reason}", path=str(path), reason=reason)
+            return None
+        if self.settings.dark_frame_check and is_dark_frame(path):
+            logger.warning("Dark frame detected, skipping: {path}", path=str(path))
+            return None
+
+        previous_path = self.last_seen_path
+        self.last_seen_path = path
+
+        if self.settings.motion_detection_enabled and previous_path:
+            try:
                 change = diff_percent(previous_path, path)
-                if change < self.settings.motion_detection_threshold:
-                    snapshot_ts = now_utc_iso()
-                    self.metrics.record_snapshot(snapshot_ts)
-                    logger.info(
-                        "Motion below threshold ({change:.2f}%), skipping {path}",
-                        change=change,
-                        path=str(path),
-                    )
-                    self._mark_processed(path, snapshot_ts)
-                    return
-
-            snapshot_ts = now_utc_iso()
-            self.metrics.record_snapshot(snapshot_ts)
-
-            groq_text, groq_latency, groq_usage = self._describe_with_groq(path, snapshot_ts)
-            tags = {}
-            if groq_text:
-                tags = self._extract_tags(groq_text, snapshot_ts)
+            except FileNotFoundError:
+                # Previous frame was removed; treat this one as changed.
+                change = None
+            if change is not None and change < self.settings.motion_detection_threshold:
+                snapshot_ts = now_utc_iso()
+                self.metrics.record_snapshot(snapshot_ts)
+                logger.info(
+                    "Motion below threshold ({change:.2f}%), skipping {path}",
+                    change=change,
+                    path=str(path),
+                )
+                return ("skip", snapshot_ts)
+
+        return ("describe", None)
+
+    # processing.lock is only taken when something needs describing, so a
+    # batch of motion-skipped frames never waits on it. Steps are queued in
+    # path order on the single-worker finish pool, which keeps last_processed
+    # advancing in order; tag extraction and the writes there overlap the
+    # next snapshot's description request. Everything finishes before the
+    # lock is released.
+    def _dispatch_screened(
+        self,
+        screened: list[tuple[Path, Optional[tuple[str, Optional[str]]]]],
+        raise_errors: bool,
+    ) -> None:
+        screened = [(path, decision) for path, decision in screened if decision is not None]
+        if not screened:
+            return
+        if any(kind == "describe" for _, (kind, _) in screened):
+            lock = storage.file_lock(self.settings.run_dir / "processing.lock")
+        else:
+            lock = nullcontext()
+        with lock:
+            pending = []
+            for path, (kind, skip_ts) in screened:
+                try:
+                    if kind == "skip":
+                        future = self._finish_pool.submit(self._mark_processed, path, skip_ts)
+                    else:
+                        future = self._describe_snapshot(path)
+                except Exception as exc:  # noqa: BLE001
+                    if raise_errors:
+                        raise
+                    logger.error("Processing failed for {path}: {error}", path=str(path), error=str(exc))
+                    continue
+                pending.append((path, future))
+            for path, future in pending:
+                try:
+                    future.result()
+                except Exception as exc:  # noqa: BLE001
+                    if raise_errors:
+                        raise
+                    logger.error("Processing failed for {path}: {error}", path=str(path), error=str(exc))
+
+    def _describe_snapshot(self, path: Path) -> Future:
+        snapshot_ts = now_utc_iso()
+        self.metrics.record_snapshot(snapshot_ts)
+
+        groq_text, groq_latency, groq_usage = self._describe_with_groq(path, snapshot_ts)
+        return self._finish_pool.submit(
+            self._finish_snapshot, path, snapshot_ts, groq_text, groq_latency, groq_usage
+        )
+
+    def _finish_snapshot(
+        self,
+        path: Path,
+        snapshot_ts: str,
+        groq_text: Optional[str],
+        groq_latency: float,
+        groq_usage: dict,
+    ) -> None:
+        pending = []
+        if groq_text:
+            tags = self._extract_tags(groq_text, snapshot_ts)
+            pending.append(
                 self._write_description(path, snapshot_ts, groq_text, groq_latency, tags)
+            )
 
-            if groq_usage:
+        if groq_usage:
+            pending.append(
                 record_usage(
                     self.settings,
                     "groq",
@@ -518,12 +714,17 @@ class TaskRunner:
                     groq_usage,
                     "description",
                 )
+            )
 
-            self._mark_processed(path, snapshot_ts)
+        # Rows commit in the batched writer; wait for them so a failed write
+        # raises here and leaves the snapshot unprocessed for the next scan.
+        for future in pending:
+            future.result()
+        self._mark_processed(path, snapshot_ts)
 
     def _describe_with_groq(self, path: Path, snapshot_ts: str) -> tuple[Optional[str], float, dict]:
         def _request():
-            mime, data = encode_image(path)
+            image_url = encode_image_data_url(path)
             messages = prompts.groq_description_messages(snapshot_ts)
             payload = {
                 "model": self.settings.groq_model,
@@ -533,16 +734,14 @@ class TaskRunner:
                         "role": "user",
                         "content": [
                             {"type": "text", "text": messages[1]["content"]},
-                            {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{data}"}},
+                            {"type": "image_url", "image_url": {"url": image_url}},
                         ],
                     },
                 ],
             }
-            headers = {"Authorization": f"Bearer {self.settings.groq_api_key}"}
-            with httpx.Client(timeout=60) as client:
-                resp = client.post(f"{GROQ_BASE_URL}/chat/completions", json=payload, headers=headers)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._groq_client, "/chat/completions", payload, 60)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.groq_limiter,
@@ -575,11 +774,9 @@ class TaskRunner:
                 "model": self.settings.groq_model,
                 "messages": messages,
             }
-            headers = {"Authorization": f"Bearer {self.settings.groq_api_key}"}
-            with httpx.Client(timeout=30) as client:
-                resp = client.post(f"{GROQ_BASE_URL}/chat/completions", json=payload, headers=headers)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._groq_client, "/chat/completions", payload, 30)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.groq_limiter,
@@ -608,14 +805,14 @@ class TaskRunner:
         return _normalize_tags(data)
 
     def compare_recent(self) -> None:
-        snapshots = storage.list_snapshot_files(self.settings.snapshots_dir)
-        if len(snapshots) < 2:
+        entries = storage.list_snapshot_files_with_mtime(self.settings.snapshots_dir)
+        if len(entries) < 2:
             return
-        latest_ts = _parse_snapshot_time(snapshots[-1], self.settings)
+        latest_ts = _parse_snapshot_time(entries[-1][1], self.settings)
         if latest_ts is None:
             return
         window = _window_snapshots(
-            snapshots,
+            entries,
             latest_ts,
             minutes=10,
             settings=self.settings,
@@ -626,14 +823,14 @@ class TaskRunner:
         self._compare_sequence(window, "10-minute")
 
     def compare_hourly(self) -> None:
-        snapshots = storage.list_snapshot_files(self.settings.snapshots_dir)
-        if len(snapshots) < 2:
+        entries = storage.list_snapshot_files_with_mtime(self.settings.snapshots_dir)
+        if len(entries) < 2:
             return
-        latest_ts = _parse_snapshot_time(snapshots[-1], self.settings)
+        latest_ts = _parse_snapshot_time(entries[-1][1], self.settings)
         if latest_ts is None:
             return
         window = _window_snapshots(
-            snapshots,
+            entries,
             latest_ts,
             minutes=60,
             settings=self.settings,
@@ -662,7 +859,7 @@ class TaskRunner:
             "prompt_version": prompts.PROMPT_VERSION,
             "latency_ms": round(latency, 2),
         }
-        storage.append_record(self.settings.data_dir, "compare_custom", record)
+        storage.append_record(self.settings.data_dir, "compare_custom", record).result()
         if usage:
             record_usage(
                 self.settings,
@@ -675,7 +872,9 @@ class TaskRunner:
 
     def ask_feed(self, query: str, lookback_hours: int, max_items: int) -> dict:
         cutoff = datetime.now(timezone.utc) - timedelta(hours=lookback_hours)
-        items = _filter_descriptions(self.settings, cutoff)
+        # The context keeps only the newest max_items; fetch just those.
+        newest = max_items if max_items > 0 else None
+        items = _filter_descriptions(self.settings, cutoff, newest=newest)
         if not items:
             return {
                 "timestamp": now_utc_iso(),
@@ -728,7 +927,7 @@ class TaskRunner:
         }
 
     def summarize_range(self, start: datetime, end: datetime, max_items: int) -> dict:
-        descriptions = storage.fetch_records_since(self.settings.data_dir, "descriptions", start)
+        descriptions = storage.fetch_records_since(self.settings.data_dir, "descriptions", start, end)
         descriptions = _filter_records_in_range(descriptions, start, end)
 
         compare_items = []
@@ -737,7 +936,7 @@ class TaskRunner:
             ("compare_hourly", "hourly"),
             ("compare_custom", "custom"),
         ):
-            records = storage.fetch_records_since(self.settings.data_dir, list_name, start)
+            records = storage.fetch_records_since(self.settings.data_dir, list_name, start, end)
             records = _filter_records_in_range(records, start, end)
             for record in records:
                 record = dict(record)
@@ -805,7 +1004,7 @@ class TaskRunner:
     def story_arc(self, lookback_hours: int, max_items: int) -> dict:
         end = datetime.now(timezone.utc)
         start = end - timedelta(hours=lookback_hours)
-        compare_items = storage.fetch_records_since(self.settings.data_dir, "compare_hourly", start)
+        compare_items = storage.fetch_records_since(self.settings.data_dir, "compare_hourly", start, end)
         compare_items = _filter_records_in_range(compare_items, start, end)
         if not compare_items:
             return {
@@ -853,7 +1052,7 @@ class TaskRunner:
     def highlight_reel(self, lookback_hours: int, max_items: int) -> dict:
         end = datetime.now(timezone.utc)
         start = end - timedelta(hours=lookback_hours)
-        descriptions = storage.fetch_records_since(self.settings.data_dir, "descriptions", start)
+        descriptions = storage.fetch_records_since(self.settings.data_dir, "descriptions", start, end)
         descriptions = _filter_records_in_range(descriptions, start, end)
         if not descriptions:
             return {
@@ -864,7 +1063,7 @@ class TaskRunner:
 
         compare_items = []
         for list_name in ("compare_10m", "compare_hourly"):
-            records = storage.fetch_records_since(self.settings.data_dir, list_name, start)
+            records = storage.fetch_records_since(self.settings.data_dir, list_name, start, end)
             records = _filter_records_in_range(records, start, end)
             compare_items.extend(records)
 
@@ -918,26 +1117,26 @@ class TaskRunner:
 
     def daily_report(self) -> None:
         local_today = local_timestamp(self.settings).date()
-        start_local = self.settings.tz.localize(datetime.combine(local_today - timedelta(days=1), dt_time.min))
-        end_local = self.settings.tz.localize(datetime.combine(local_today, dt_time.min))
+        start_local = datetime.combine(local_today - timedelta(days=1), dt_time.min, tzinfo=self.settings.tz)
+        end_local = datetime.combine(local_today, dt_time.min, tzinfo=self.settings.tz)
         start = start_local.astimezone(timezone.utc)
         end = end_local.astimezone(timezone.utc)
 
-        recent = storage.fetch_records_since(self.settings.data_dir, "compare_hourly", start)
+        recent = storage.fetch_records_since(self.settings.data_dir, "compare_hourly", start, end)
         recent = _filter_records_in_range(recent, start, end)
         if not recent:
             return
 
-        tag_items = storage.fetch_records_since(self.settings.data_dir, "descriptions", start)
+        tag_items = storage.fetch_records_since(self.settings.data_dir, "descriptions", start, end)
         tag_items = _filter_records_in_range(tag_items, start, end)
         tags_summary = _aggregate_tags(tag_items)
         tags_summary_text = _format_tags_summary(tags_summary)
 
-        summary_text, highlights, usage = self._daily_summary(recent, tags_summary_text)
+        local_label = (local_today - timedelta(days=1)).strftime("%Y-%m-%d")
+        summary_text, highlights, usage = self._daily_summary(recent, tags_summary_text, local_label)
         if not summary_text:
             return
         timestamp = now_utc_iso()
-        local_label = (local_today - timedelta(days=1)).strftime("%Y-%m-%d")
         report = {
             "timestamp": timestamp,
             "date": local_label,
@@ -949,9 +1148,13 @@ class TaskRunner:
             "model": self.settings.google_model,
             "prompt_version": prompts.PROMPT_VERSION,
         }
+        # Encode once for both the report file and its record row.
+        encoded = orjson.dumps(report, option=orjson.OPT_NON_STR_KEYS)
         output_path = self.settings.daily_reports_dir / f"{local_label}.json"
-        storage.atomic_write_json(output_path, report)
-        storage.append_record(self.settings.data_dir, "daily_reports", report)
+        storage.atomic_write_bytes(output_path, encoded)
+        storage.append_record(
+            self.settings.data_dir, "daily_reports", report, encoded=encoded
+        ).result()
 
         if usage:
             record_usage(
@@ -962,45 +1165,25 @@ class TaskRunner:
                 "daily_report",
             )
 
-    def _compare_images(self, path_a: Path, path_b: Path, label: str) -> None:
-        text, latency, usage = self._run_gemini_compare(path_a, path_b, label)
-        timestamp = now_utc_iso()
-        if not text:
-            self.metrics.last_gemini_failure = timestamp
-            self.metrics.record_api_call("gemini", False, latency)
-            return
-        if len(text) > 200:
-            logger.info("Truncating Gemini compare output to 200 chars")
-        text = safe_truncate(text, 200)
-        self.metrics.last_gemini_success = timestamp
-        self.metrics.record_api_call("gemini", True, latency)
-
-        record = {
-            "timestamp": timestamp,
-            "snapshot_a": _relative_path(path_a, self.settings.data_dir),
-            "snapshot_b": _relative_path(path_b, self.settings.data_dir),
-            "text": text,
-            "provider": "gemini",
-            "model": self.settings.google_model,
-            "prompt_version": prompts.PROMPT_VERSION,
-            "latency_ms": round(latency, 2),
-        }
-        out_dir = self.settings.compare_10m_dir if label == "10-minute" else self.settings.compare_hourly_dir
-        out_path = _json_path_for_snapshot(path_b, self.settings.snapshots_dir, out_dir)
-        storage.atomic_write_json(out_path, record)
-        list_name = "compare_10m" if label == "10-minute" else "compare_hourly"
-        storage.append_record(self.settings.data_dir, list_name, record)
-
-        if usage:
-            record_usage(
-                self.settings,
-                "gemini",
-                self.settings.google_model,
-                usage,
-                f"compare_{label}",
-            )
+    # Static scenes produce windows of near-identical frames; a difference hash
+    # per frame (cached by mtime) is far cheaper than a Gemini round trip.
+    def _frames_look_identical(self, paths: list[Path]) -> bool:
+        threshold = self.settings.compare_phash_threshold
+        if threshold <= 0:
+            return False
+        first = image_hash(paths[0])
+        if first is None:
+            return False
+        for path in paths[1:]:
+            current = image_hash(path)
+            if current is None or hamming_distance(first, current) > threshold:
+                return False
+        return True
 
     def _compare_sequence(self, paths: list[Path], label: str) -> None:
+        if self._frames_look_identical(paths):
+            logger.info("Skipping {label} compare: frames are near-duplicates", label=label)
+            return
         text, latency, usage = self._run_gemini_compare_sequence(paths, label)
         timestamp = now_utc_iso()
         if not text:
@@ -1028,9 +1211,10 @@ class TaskRunner:
         }
         out_dir = self.settings.compare_10m_dir if label == "10-minute" else self.settings.compare_hourly_dir
         out_path = _json_path_for_snapshot(last, self.settings.snapshots_dir, out_dir)
-        storage.atomic_write_json(out_path, record)
+        # Audit copy of the SQLite row; see _write_description.
+        storage.atomic_write_json(out_path, record, durable=False)
         list_name = "compare_10m" if label == "10-minute" else "compare_hourly"
-        storage.append_record(self.settings.data_dir, list_name, record)
+        storage.append_record(self.settings.data_dir, list_name, record).result()
 
         if usage:
             record_usage(
@@ -1063,10 +1247,9 @@ class TaskRunner:
                 "generationConfig": {"temperature": 0.2},
             }
             url = f"{GEMINI_BASE_URL}/models/{self.settings.google_model}:generateContent"
-            with httpx.Client(timeout=60) as client:
-                resp = client.post(url, params={"key": self.settings.google_api_key}, json=payload)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._gemini_client, url, payload, 60)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.gemini_limiter,
@@ -1105,10 +1288,9 @@ class TaskRunner:
                 "generationConfig": {"temperature": 0.2},
             }
             url = f"{GEMINI_BASE_URL}/models/{self.settings.google_model}:generateContent"
-            with httpx.Client(timeout=90) as client:
-                resp = client.post(url, params={"key": self.settings.google_api_key}, json=payload)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._gemini_client, url, payload, 90)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.gemini_limiter,
@@ -1142,10 +1324,9 @@ class TaskRunner:
                 "generationConfig": {"temperature": 0.2},
             }
             url = f"{GEMINI_BASE_URL}/models/{self.settings.google_model}:generateContent"
-            with httpx.Client(timeout=60) as client:
-                resp = client.post(url, params={"key": self.settings.google_api_key}, json=payload)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._gemini_client, url, payload, 60)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.gemini_limiter,
@@ -1186,10 +1367,9 @@ class TaskRunner:
                 "generationConfig": {"temperature": 0.2},
             }
             url = f"{GEMINI_BASE_URL}/models/{self.settings.google_model}:generateContent"
-            with httpx.Client(timeout=60) as client:
-                resp = client.post(url, params={"key": self.settings.google_api_key}, json=payload)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._gemini_client, url, payload, 60)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.gemini_limiter,
@@ -1228,10 +1408,9 @@ class TaskRunner:
                 "generationConfig": {"temperature": 0.2},
             }
             url = f"{GEMINI_BASE_URL}/models/{self.settings.google_model}:generateContent"
-            with httpx.Client(timeout=60) as client:
-                resp = client.post(url, params={"key": self.settings.google_api_key}, json=payload)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._gemini_client, url, payload, 60)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.gemini_limiter,
@@ -1245,9 +1424,10 @@ class TaskRunner:
         usage = _extract_gemini_usage(result)
         return text, latency, usage
 
-    def _daily_summary(self, items: list[dict], tags_summary_text: str) -> tuple[str, list[str], dict]:
+    def _daily_summary(
+        self, items: list[dict], tags_summary_text: str, date_label: str
+    ) -> tuple[str, list[str], dict]:
         def _request():
-            date_label = local_timestamp(self.settings).strftime("%Y-%m-%d")
             system, user = prompts.gemini_daily_prompt(date_label, tags_summary_text)
             content_lines = [item.get("text", "") for item in items if item.get("text")]
             text_block = "\n".join(content_lines)
@@ -1265,10 +1445,9 @@ class TaskRunner:
                 "generationConfig": {"temperature": 0.2},
             }
             url = f"{GEMINI_BASE_URL}/models/{self.settings.google_model}:generateContent"
-            with httpx.Client(timeout=60) as client:
-                resp = client.post(url, params={"key": self.settings.google_api_key}, json=payload)
-                resp.raise_for_status()
-                return resp.json()
+            resp = _post_json(self._gemini_client, url, payload, 60)
+            resp.raise_for_status()
+            return _response_json(resp)
 
         result, latency, error = _call_with_retry(
             self.gemini_limiter,
@@ -1294,7 +1473,7 @@ class TaskRunner:
         text: str,
         latency: float,
         tags: dict[str, list[str]],
-    ) -> None:
+    ) -> Future:
         record = {
             "timestamp": timestamp,
             "snapshot": _relative_path(path, self.settings.data_dir),
@@ -1306,8 +1485,11 @@ class TaskRunner:
             "latency_ms": round(latency, 2),
         }
         out_path = _json_path_for_snapshot(path, self.settings.snapshots_dir, self.settings.descriptions_dir)
-        storage.atomic_write_json(out_path, record)
-        storage.append_record(self.settings.data_dir, "descriptions", record)
+        # The SQLite row is the record of truth and commits in the batched
+        # writer; the per-snapshot file is an audit copy, so skip its fsyncs
+        # rather than paying two syncs per frame during catch-up bursts.
+        storage.atomic_write_json(out_path, record, durable=False)
+        return storage.append_record(self.settings.data_dir, "descriptions", record)
 
     def _mark_processed(self, path: Path, timestamp: str) -> None:
         self.last_processed_path = path
@@ -1325,7 +1507,7 @@ def _parse_daily_response(text: str) -> tuple[str, list[str]]:
         if isinstance(summary, str):
             cleaned = summary.strip()
             if isinstance(highlights, list):
-                items = [str(item).strip() for item in highlights if str(item).strip()]
+                items = [entry for item in highlights if (entry := str(item).strip())]
             else:
                 items = []
             return cleaned, items
@@ -1333,46 +1515,57 @@ def _parse_daily_response(text: str) -> tuple[str, list[str]]:
 
 
 def _extract_gemini_text(payload: dict) -> str:
-    candidates = payload.get("candidates", [])
+    candidates = payload.get("candidates")
     if not candidates:
         return ""
-    parts = candidates[0].get("content", {}).get("parts", [])
-    text_parts = [p.get("text", "") for p in parts if p.get("text")]
-    return " ".join(text_parts).strip()
-
-
-def _parse_iso(value: Optional[str]):
-    if not value:
-        return None
-    try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
-    except ValueError:
-        return None
+    parts = candidates[0].get("content", {}).get("parts", ())
+    return " ".join([text for part in parts if (text := part.get("text"))]).strip()
 
 
-def _filter_descriptions(settings, cutoff: datetime) -> list[dict]:
-    return storage.fetch_records_since(settings.data_dir, "descriptions", cutoff)
+def _filter_descriptions(settings, cutoff: datetime, newest: Optional[int] = None) -> list[dict]:
+    return storage.fetch_records_since(settings.data_dir, "descriptions", cutoff, newest=newest)
 
 
+# Tags repeat heavily, so count raw values in one C-level Counter pass and
+# strip/lower each distinct value once rather than once per occurrence.
 def _aggregate_tags(items: list[dict]) -> dict[str, list[tuple[str, int]]]:
-    counts = {
-        "people": Counter(),
-        "vehicles": Counter(),
-        "objects": Counter(),
-    }
+    # One pass over the items gathers all three categories, with the dict
+    # check and lookups hoisted out of the per-category work.
+    people: list = []
+    vehicles: list = []
+    objects: list = []
     for item in items:
-        tags = item.get("tags", {})
-        for key in counts:
-            values = tags.get(key, []) if isinstance(tags, dict) else []
-            for value in values:
-                if isinstance(value, str) and value.strip():
-                    counts[key][value.strip().lower()] += 1
+        tags = item.get("tags")
+        if not isinstance(tags, dict):
+            continue
+        get = tags.get
+        people.extend(get("people") or ())
+        vehicles.extend(get("vehicles") or ())
+        objects.extend(get("objects") or ())
     return {
-        key: counts[key].most_common(5)
-        for key in counts
+        "people": _top_tags(people),
+        "vehicles": _top_tags(vehicles),
+        "objects": _top_tags(objects),
     }
 
 
+def _top_tags(values: list) -> list[tuple[str, int]]:
+    try:
+        raw = Counter(values)
+    except TypeError:
+        # Unhashable junk (e.g. nested lists) in a hand-edited record.
+        raw = Counter(value for value in values if isinstance(value, str))
+    counts = Counter()
+    for value, count in raw.items():
+        if isinstance(value, str) and (cleaned := value.strip()):
+            counts[cleaned.lower()] += count
+    return counts.most_common(5)
+
+
+# Both helpers run once per frame per stage and again in every compare and
+# report that includes it; paths hash cheaply (pathlib caches the hash) and
+# results are immutable, so memoize on the Path arguments directly.
+@lru_cache(maxsize=4096)
 def _relative_path(path: Path, data_dir: Path) -> str:
     try:
         return str(path.relative_to(data_dir)).replace("\\", "/")
@@ -1380,66 +1573,93 @@ def _relative_path(path: Path, data_dir: Path) -> str:
         return str(path)
 
 
+@lru_cache(maxsize=4096)
 def _json_path_for_snapshot(snapshot_path: Path, snapshots_dir: Path, output_dir: Path) -> Path:
     rel = snapshot_path.relative_to(snapshots_dir)
     return output_dir / rel.with_suffix(".json")
 
 
 def _snapshot_label(path: Path, settings) -> str:
-    ts = _parse_snapshot_time(path, settings)
-    if ts is None:
+    parts = path.parts
+    if len(parts) < 4:
         return path.name
-    local_dt = ts.astimezone(settings.tz)
-    return local_dt.strftime("%Y-%m-%d %H:%M:%S %Z")
+    return _snapshot_label_components(parts[-4], parts[-3], parts[-2], parts[-1], settings.tz)
+
+
+# Keyed like _parse_snapshot_components, whose cached UTC result it reuses, so
+# relabelling a frame in later compares skips the UTC-to-local round trip.
+@lru_cache(maxsize=1024)
+def _snapshot_label_components(
+    year_part: str,
+    month_part: str,
+    day_part: str,
+    filename: str,
+    tz,
+) -> str:
+    ts = _parse_snapshot_components(year_part, month_part, day_part, filename, tz)
+    if ts is None:
+        return filename
+    return ts.astimezone(tz).strftime("%Y-%m-%d %H:%M:%S %Z")
 
 
 def _parse_snapshot_time(path: Path, settings) -> Optional[datetime]:
+    parts = path.parts
+    if len(parts) < 4:
+        return None
+    # parts is cached on the Path; .stem would re-split the name on every call.
+    return _parse_snapshot_components(parts[-4], parts[-3], parts[-2], parts[-1], settings.tz)
+
+
+@lru_cache(maxsize=4096)
+def _parse_snapshot_components(
+    year_part: str,
+    month_part: str,
+    day_part: str,
+    filename: str,
+    tz,
+) -> Optional[datetime]:
+    match = _SNAPSHOT_STEM_RE.match(filename)
+    if match is None:
+        return None
+    hour, minute, second = match.groups()
     try:
-        parts = path.parts
-        filename = path.stem
-        year = int(parts[-4])
-        month = int(parts[-3])
-        day = int(parts[-2])
-        hour = int(filename[0:2])
-        minute = int(filename[2:4])
-        second = int(filename[4:6])
-        local_dt = settings.tz.localize(datetime(year, month, day, hour, minute, second))
-        return local_dt.astimezone(timezone.utc)
-    except (ValueError, IndexError):
+        local_dt = datetime(
+            int(year_part), int(month_part), int(day_part), int(hour), int(minute), int(second), tzinfo=tz
+        )
+    except ValueError:
         return None
+    return local_dt.astimezone(timezone.utc)
 
 
-def _find_nearest_snapshot(snapshots: list[Path], target: datetime, settings) -> Optional[Path]:
-    best = None
-    best_delta = None
-    for path in snapshots:
-        ts = _parse_snapshot_time(path, settings)
-        if ts is None:
-            continue
-        delta = abs((ts - target).total_seconds())
-        if best_delta is None or delta < best_delta:
-            best_delta = delta
-            best = path
-    if best_delta is not None and best_delta > 60 * 60 * 2:
-        return None
-    return best
+def _entry_mtime(entry: tuple[float, Path]) -> float:
+    return entry[0]
 
 
+# Bisects the mtime-sorted listing down to the window padded by
+# _WINDOW_MTIME_SLACK_SEC on both sides, then parses only those filenames,
+# newest first, so the cost follows the window size rather than the archive.
+# Filename time is authoritative; mtime only bounds the search. A snapshot is
+# written just after capture, so the two agree up to clock skew on the capture
+# host, which the slack absorbs.
 def _window_snapshots(
-    snapshots: list[Path],
+    entries: list[tuple[float, Path]],
     end: datetime,
     minutes: int,
     settings,
     max_images: int,
 ) -> list[Path]:
     start = end - timedelta(minutes=minutes)
+    low = bisect_left(entries, start.timestamp() - _WINDOW_MTIME_SLACK_SEC, key=_entry_mtime)
+    high = bisect_right(entries, end.timestamp() + _WINDOW_MTIME_SLACK_SEC, key=_entry_mtime)
     in_window = []
-    for path in snapshots:
+    for index in range(high - 1, low - 1, -1):
+        if len(in_window) >= max_images:
+            break
+        path = entries[index][1]
         ts = _parse_snapshot_time(path, settings)
         if ts is None:
             continue
         if start <= ts <= end:
             in_window.append(path)
-    if len(in_window) > max_images:
-        return in_window[-max_images:]
+    in_window.reverse()
     return in_window
@@ -1,11 +1,19 @@
 ﻿from __future__ import annotations
 
+import time
 from collections import defaultdict
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any
 
 from . import storage
 
+# Canonical record timestamp: UTC, whole seconds, "Z" suffix.
+ISO_Z_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+_NO_RATES = (0.0, 0.0)
+_cost_rates_cache: tuple[Any, dict[str, tuple[float, float]]] | None = None
+
 
 def record_usage(
     settings,
@@ -13,15 +21,15 @@ def record_usage(
     model: str,
     usage: dict[str, int],
     endpoint: str,
-) -> None:
+) -> Future | None:
     if not usage:
-        return
+        return None
     input_tokens = int(usage.get("input_tokens", 0))
     output_tokens = int(usage.get("output_tokens", 0))
     total_tokens = int(usage.get("total_tokens", input_tokens + output_tokens))
     cost_usd = _calculate_cost(settings, provider, input_tokens, output_tokens)
     record = {
-        "timestamp": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "timestamp": time.strftime(ISO_Z_FORMAT, time.gmtime()),
         "provider": provider,
         "model": model,
         "endpoint": endpoint,
@@ -30,27 +38,23 @@ def record_usage(
         "total_tokens": total_tokens,
         "cost_usd": round(cost_usd, 6),
     }
-    storage.append_record(settings.data_dir, "usage", record)
+    return storage.append_record(settings.data_dir, "usage", record)
 
 
 def summarize_usage(settings, days: int = 7) -> dict[str, Any]:
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    records = storage.fetch_records_since(settings.data_dir, "usage", cutoff)
 
     totals = _empty_totals()
     by_provider: dict[str, dict[str, float]] = defaultdict(_empty_totals)
     by_day: dict[str, dict[str, float]] = defaultdict(_empty_totals)
 
-    for record in records:
-        timestamp = _parse_iso(record.get("timestamp"))
-        if timestamp is None:
-            continue
-        provider = record.get("provider", "unknown")
-        date_key = timestamp.astimezone(timezone.utc).strftime("%Y-%m-%d")
-
-        _accumulate(totals, record)
-        _accumulate(by_provider[provider], record)
-        _accumulate(by_day[date_key], record)
+    grouped = storage.usage_totals_since(settings.data_dir, cutoff)
+    if grouped is None:
+        grouped = _group_usage_records(storage.iter_records_since(settings.data_dir, "usage", cutoff))
+    for provider, date_key, *values in grouped:
+        _add_totals(totals, values)
+        _add_totals(by_provider[provider], values)
+        _add_totals(by_day[date_key], values)
 
     day_list = [
         {"date": day, **_normalize(totals)}
@@ -65,18 +69,50 @@ def summarize_usage(settings, days: int = 7) -> dict[str, Any]:
     }
 
 
-def _calculate_cost(settings, provider: str, input_tokens: int, output_tokens: int) -> float:
-    if provider == "groq":
-        input_rate = settings.groq_cost_input_million
-        output_rate = settings.groq_cost_output_million
-    elif provider == "gemini":
-        input_rate = settings.gemini_cost_input_million
-        output_rate = settings.gemini_cost_output_million
-    else:
-        input_rate = 0.0
-        output_rate = 0.0
+# Python fallback for SQLite builds without JSON1. Like the SQL path, it sums
+# per (provider, day) tuple key first, so each record touches one bucket and
+# summarize_usage only folds the handful of grouped rows.
+def _group_usage_records(records) -> list[tuple]:
+    groups: dict[tuple[str, str], list[float]] = {}
+    for record in records:
+        timestamp = _parse_iso(record.get("timestamp"))
+        if timestamp is None:
+            continue
+        get = record.get
+        # date().isoformat() is ~5x cheaper than strftime; astimezone
+        # stays because legacy rows may carry non-UTC offsets.
+        key = (get("provider", "unknown"), timestamp.astimezone(timezone.utc).date().isoformat())
+        sums = groups.get(key)
+        if sums is None:
+            sums = groups[key] = [0.0, 0.0, 0.0, 0.0]
+        sums[0] += float(get("input_tokens", 0))
+        sums[1] += float(get("output_tokens", 0))
+        sums[2] += float(get("total_tokens", 0))
+        sums[3] += float(get("cost_usd", 0))
+    return [(provider, day, *sums) for (provider, day), sums in groups.items()]
 
-    return (input_tokens / 1_000_000) * input_rate + (output_tokens / 1_000_000) * output_rate
+
+def _calculate_cost(settings, provider: str, input_tokens: int, output_tokens: int) -> float:
+    input_rate, output_rate = _cost_rates(settings).get(provider, _NO_RATES)
+    return input_tokens * input_rate + output_tokens * output_rate
+
+
+# Per-token rates, rebuilt only when a different Settings object comes in
+# (settings are frozen and cached by the loader).
+def _cost_rates(settings) -> dict[str, tuple[float, float]]:
+    global _cost_rates_cache
+    cached = _cost_rates_cache
+    if cached is not None and cached[0] is settings:
+        return cached[1]
+    rates = {
+        "groq": (settings.groq_cost_input_million * 1e-6, settings.groq_cost_output_million * 1e-6),
+        "gemini": (
+            settings.gemini_cost_input_million * 1e-6,
+            settings.gemini_cost_output_million * 1e-6,
+        ),
+    }
+    _cost_rates_cache = (settings, rates)
+    return rates
 
 
 def _empty_totals() -> dict[str, float]:
@@ -88,11 +124,12 @@ def _empty_totals() -> dict[str, float]:
     }
 
 
-def _accumulate(target: dict[str, float], record: dict[str, Any]) -> None:
-    target["input_tokens"] += float(record.get("input_tokens", 0))
-    target["output_tokens"] += float(record.get("output_tokens", 0))
-    target["total_tokens"] += float(record.get("total_tokens", 0))
-    target["cost_usd"] += float(record.get("cost_usd", 0))
+def _add_totals(target: dict[str, float], values) -> None:
+    input_tokens, output_tokens, total_tokens, cost_usd = values
+    target["input_tokens"] += input_tokens
+    target["output_tokens"] += output_tokens
+    target["total_tokens"] += total_tokens
+    target["cost_usd"] += cost_usd
 
 
 def _normalize(data: dict[str, float]) -> dict[str, float]:
@@ -104,10 +141,14 @@ def _normalize(data: dict[str, float]) -> dict[str, float]:
     }
 
 
+# Shared with tasks. Usage, ask and daily-report paths re-parse the same record
+# timestamps; datetimes are immutable, so cached results are safe to share.
+# The C fromisoformat already beats any Python-level slicing fast path.
+@lru_cache(maxsize=8192)
 def _parse_iso(value: str | None) -> datetime | None:
     if not value:
         return None
     try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return datetime.fromisoformat(value)
     except ValueError:
         return None
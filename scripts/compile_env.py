@@ -0,0 +1,32 @@
+"""Compile a .env file into app/_env_compiled.py.
+
+load_settings() imports the generated module instead of parsing .env at
+startup. Re-run this script whenever .env changes:
+
+    python scripts/compile_env.py [path/to/.env]
+"""
+import sys
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+OUTPUT_PATH = REPO_ROOT / "app" / "_env_compiled.py"
+
+
+def main() -> int:
+    env_path = Path(sys.argv[1]) if len(sys.argv) > 1 else REPO_ROOT / ".env"
+    if not env_path.exists():
+        print(f"{env_path} not found")
+        return 1
+    values = {key: value for key, value in dotenv_values(env_path).items() if value is not None}
+    lines = ["# Generated by scripts/compile_env.py; do not edit or commit.", "ENV = {"]
+    lines.extend(f"    {key!r}: {value!r}," for key, value in sorted(values.items()))
+    lines.append("}")
+    OUTPUT_PATH.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"Wrote {len(values)} values to {OUTPUT_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,7 +2,7 @@
 
 import pytest
 
-from app.config import load_settings
+from app.config import _parse_bool, _parse_int, load_settings
 
 
 def test_load_settings_valid(tmp_path, monkeypatch):
@@ -22,3 +22,27 @@ def test_load_settings_invalid_source(tmp_path, monkeypatch):
     monkeypatch.setenv("CAMERA_SOURCE", "invalid")
     with pytest.raises(ValueError):
         load_settings()
+
+
+def test_load_settings_reuses_cached_settings(tmp_path, monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("CAMERA_SOURCE", "windows-host")
+    first = load_settings()
+    assert load_settings() is first
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path / "other"))
+    second = load_settings()
+    assert second is not first
+    assert second.data_dir == tmp_path / "other"
+
+
+def test_parse_helpers():
+    assert _parse_bool(" Yes ") is True
+    assert _parse_bool("off", True) is False
+    assert _parse_bool(None, True) is True
+    assert _parse_int(" 42 ", 0) == 42
+    assert _parse_int("-3", 0) == -3
+    assert _parse_int("abc", 7) == 7
+    assert _parse_int("", 7) == 7
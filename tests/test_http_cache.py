@@ -0,0 +1,53 @@
+import importlib
+
+from fastapi.testclient import TestClient
+
+from app import storage
+
+
+def _load_app(monkeypatch, tmp_path):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("CAMERA_SOURCE", "windows-host")
+    monkeypatch.setenv("API_KEY", "")
+
+    from app import main as main_module
+
+    importlib.reload(main_module)
+    main_module.app.router.on_startup.clear()
+    main_module.app.router.on_shutdown.clear()
+    return main_module
+
+
+def test_config_supports_etag_revalidation(monkeypatch, tmp_path):
+    main_module = _load_app(monkeypatch, tmp_path)
+    client = TestClient(main_module.app)
+
+    response = client.get("/api/config")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "max-age=60" in response.headers["Cache-Control"]
+
+    response = client.get("/api/config", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_descriptions_etag_changes_with_new_records(monkeypatch, tmp_path):
+    main_module = _load_app(monkeypatch, tmp_path)
+    client = TestClient(main_module.app)
+
+    etag = client.get("/api/descriptions?limit=10").headers["ETag"]
+    response = client.get("/api/descriptions?limit=10", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    storage.append_record(
+        main_module.settings.data_dir,
+        "descriptions",
+        {"timestamp": "2025-01-01T00:00:00Z", "text": "new"},
+    )
+    response = client.get("/api/descriptions?limit=10", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["text"] == "new"
+    assert response.headers["ETag"] != etag
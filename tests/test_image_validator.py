@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from PIL import Image
+
+from app.image_validator import (
+    diff_percent,
+    hamming_distance,
+    image_hash,
+    is_dark_frame,
+    validate_image,
+)
+
+_SETTINGS = SimpleNamespace(
+    max_file_size_mb=10,
+    image_min_width=320,
+    image_min_height=240,
+    image_max_width=4096,
+    image_max_height=4096,
+)
+
+
+def test_validate_image_accepts_jpeg(tmp_path):
+    path = tmp_path / "ok.jpg"
+    Image.new("RGB", (1280, 720), (10, 20, 30)).save(path)
+    assert validate_image(path, _SETTINGS) == (True, "ok")
+
+
+def test_validate_image_rejects_truncated_jpeg(tmp_path):
+    source = tmp_path / "source.jpg"
+    Image.new("RGB", (1280, 720), (10, 20, 30)).save(source)
+    path = tmp_path / "truncated.jpg"
+    path.write_bytes(source.read_bytes()[:1000])
+    assert validate_image(path, _SETTINGS) == (False, "decode_error")
+
+
+def test_diff_percent_identical_images(tmp_path):
+    path_a = tmp_path / "a.png"
+    path_b = tmp_path / "b.png"
+    Image.new("RGB", (10, 10), (50, 50, 50)).save(path_a)
+    Image.new("RGB", (10, 10), (50, 50, 50)).save(path_b)
+    assert diff_percent(path_a, path_b) == 0.0
+
+
+def test_diff_percent_partial_change(tmp_path):
+    path_a = tmp_path / "a.png"
+    path_b = tmp_path / "b.png"
+    Image.new("RGB", (10, 10), (0, 0, 0)).save(path_a)
+    changed = Image.new("RGB", (10, 10), (0, 0, 0))
+    for x in range(5):
+        for y in range(10):
+            changed.putpixel((x, y), (0, 200, 0))
+    changed.save(path_b)
+    assert diff_percent(path_a, path_b) == 50.0
+
+
+def test_validate_image_reads_png_header(tmp_path):
+    path = tmp_path / "small.png"
+    Image.new("RGB", (100, 100)).save(path)
+    assert validate_image(path, _SETTINGS) == (False, "image_too_small")
+
+
+def test_validate_image_rejects_unsupported_format(tmp_path):
+    path = tmp_path / "frame.gif"
+    Image.new("RGB", (640, 480)).save(path)
+    assert validate_image(path, _SETTINGS) == (False, "unsupported_format")
+
+
+def test_is_dark_frame(tmp_path):
+    dark = tmp_path / "dark.jpg"
+    bright = tmp_path / "bright.jpg"
+    Image.new("RGB", (1280, 720), (2, 2, 2)).save(dark)
+    Image.new("RGB", (1280, 720), (200, 200, 200)).save(bright)
+    assert is_dark_frame(dark) is True
+    assert is_dark_frame(bright) is False
+
+
+def test_image_hash_matches_near_duplicates(tmp_path):
+    left_dark = Image.linear_gradient("L").rotate(90).convert("RGB").resize((640, 480))
+    path_a = tmp_path / "a.jpg"
+    path_b = tmp_path / "b.jpg"
+    path_c = tmp_path / "c.jpg"
+    left_dark.save(path_a, quality=90)
+    left_dark.save(path_b, quality=60)
+    left_dark.transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(path_c)
+    hash_a = image_hash(path_a)
+    assert hamming_distance(hash_a, image_hash(path_b)) <= 4
+    assert hamming_distance(hash_a, image_hash(path_c)) > 32
+    assert image_hash(tmp_path / "missing.jpg") is None
@@ -0,0 +1,30 @@
+import threading
+
+from app.monitoring import Metrics, health_status
+
+
+def test_record_api_call_is_thread_safe():
+    metrics = Metrics()
+
+    def worker() -> None:
+        for index in range(1000):
+            metrics.record_api_call("groq", index % 2 == 0, 1.0)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = metrics.api_calls["groq"]
+    assert stats.success == 4000
+    assert stats.failure == 4000
+    assert stats.latency_total_ms == 8000.0
+
+
+def test_health_status_uses_snapshot_epoch():
+    metrics = Metrics()
+    assert health_status(metrics.last_snapshot_epoch, 1000.0, 0, 10) == "degraded"
+    metrics.record_snapshot("2025-01-01T00:00:00Z")
+    assert health_status(metrics.last_snapshot_epoch, 1000.0, 0, 10) == "healthy"
+    assert health_status(metrics.last_snapshot_epoch, 50.0, 0, 10) == "unhealthy"
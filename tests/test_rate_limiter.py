@@ -7,3 +7,46 @@ def test_rate_limiter_circuit_opens():
     limiter = RateLimiter(rpm=60, max_attempts=1, base_delay=1, circuit_threshold=1)
     limiter.record_failure()
     assert limiter.circuit_open_until >= time.time()
+
+
+def test_rate_limiter_token_bucket_throttles_after_burst(monkeypatch):
+    limiter = RateLimiter(rpm=2, max_attempts=1, base_delay=1, circuit_threshold=1)
+    sleeps: list[float] = []
+
+    def fake_wait(seconds: float) -> bool:
+        sleeps.append(seconds)
+        limiter.last_refill -= seconds
+        return False
+
+    monkeypatch.setattr(limiter.cond, "wait", fake_wait)
+    limiter.acquire()
+    limiter.acquire()
+    assert sleeps == []
+    limiter.acquire()
+    assert len(sleeps) == 1 and 29 < sleeps[0] <= 30
+
+
+def test_rate_limiter_backoff_is_jittered_and_capped(monkeypatch):
+    limiter = RateLimiter(rpm=60, max_attempts=3, base_delay=2, circuit_threshold=5)
+    sleeps: list[float] = []
+    monkeypatch.setattr(limiter.cond, "wait", sleeps.append)
+    for attempt in (1, 3, 50):
+        limiter.backoff(attempt)
+    assert 0 <= sleeps[0] <= 2
+    assert 0 <= sleeps[1] <= 8
+    assert 0 <= sleeps[2] <= 60
+
+
+def test_rate_limiter_circuit_reset_wakes_waiters():
+    import threading
+
+    limiter = RateLimiter(rpm=60, max_attempts=1, base_delay=1, circuit_threshold=1)
+    limiter.record_failure()
+    waiter = threading.Thread(target=limiter.acquire)
+    start = time.monotonic()
+    waiter.start()
+    time.sleep(0.05)
+    limiter.record_success()
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
+    assert time.monotonic() - start < 5
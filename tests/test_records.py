@@ -1,6 +1,10 @@
+import json
+import sqlite3
 import threading
 from datetime import datetime, timedelta, timezone
 
+import pytest
+
 from app import storage
 
 
@@ -61,3 +65,108 @@ def test_concurrent_appends_are_resilient(tmp_path):
     assert not errors
     records = storage.fetch_records(tmp_path, "usage")
     assert len(records) == 6
+
+
+def test_record_connections_are_reused_per_thread(tmp_path):
+    db_path = storage._init_record_db(tmp_path)
+    conn = storage._get_record_conn(db_path)
+    assert storage._get_record_conn(db_path) is conn
+
+    other: list = []
+    thread = threading.Thread(target=lambda: other.append(storage._get_record_conn(db_path)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_flush_records_commits_queued_appends(tmp_path):
+    now = datetime.now(timezone.utc)
+    for index in range(20):
+        storage.append_record(tmp_path, "usage", {"timestamp": _iso(now), "text": f"r{index}"})
+
+    assert storage.flush_records(timeout=5)
+    db_path = storage._record_db_path(tmp_path)
+    with storage._record_db_conn(db_path) as conn:
+        (count,) = conn.execute("SELECT COUNT(*) FROM records WHERE list_name = 'usage'").fetchone()
+    assert count == 20
+
+
+def test_failed_record_write_reaches_the_caller(tmp_path, monkeypatch):
+    def fail(db_path, rows):
+        raise sqlite3.DatabaseError("disk I/O error")
+
+    monkeypatch.setattr(storage, "_insert_record_rows", fail)
+    future = storage.append_record(tmp_path, "descriptions", {"timestamp": "2025-01-15T12:00:00Z"})
+    with pytest.raises(sqlite3.DatabaseError):
+        future.result(timeout=5)
+    assert storage.flush_records(timeout=5)
+
+
+def test_prune_records_uses_timestamp_index(tmp_path):
+    db_path = storage._init_record_db(tmp_path)
+    with storage._record_db_conn(db_path) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN DELETE FROM records "
+            "WHERE list_name = ? AND timestamp_epoch IS NOT NULL AND timestamp_epoch < ?",
+            ("usage", 0.0),
+        ).fetchall()
+    assert any("idx_records_list_ts" in row[-1] for row in plan)
+
+
+def test_fetch_records_since_honours_upper_bound(tmp_path):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for minutes, text in ((30, "old"), (10, "mid"), (0, "new")):
+        record = {"timestamp": _iso(now - timedelta(minutes=minutes)), "text": text}
+        storage.append_record(tmp_path, "descriptions", record)
+
+    items = storage.fetch_records_since(
+        tmp_path, "descriptions", now - timedelta(minutes=20), until=now - timedelta(minutes=5)
+    )
+    assert [item["text"] for item in items] == ["mid"]
+
+
+def test_fetch_records_since_newest_keeps_latest_in_time_order(tmp_path):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for minutes, text in ((30, "a"), (5, "d"), (20, "b"), (10, "c")):
+        record = {"timestamp": _iso(now - timedelta(minutes=minutes)), "text": text}
+        storage.append_record(tmp_path, "descriptions", record)
+
+    items = storage.fetch_records_since(
+        tmp_path, "descriptions", now - timedelta(minutes=25), newest=2
+    )
+    assert [item["text"] for item in items] == ["c", "d"]
+
+
+def test_iter_records_since_streams_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_RECORD_STREAM_BATCH_ROWS", 2)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for minutes in range(5, 0, -1):
+        record = {"timestamp": _iso(now - timedelta(minutes=minutes)), "n": minutes}
+        storage.append_record(tmp_path, "usage", record)
+
+    stream = storage.iter_records_since(tmp_path, "usage", now - timedelta(minutes=10))
+    assert [item["n"] for item in stream] == [5, 4, 3, 2, 1]
+
+
+def test_legacy_json_list_is_migrated(tmp_path):
+    legacy = [
+        {"timestamp": "2025-01-01T10:00:00Z", "text": "a"},
+        {"ts": "2025-01-01T10:00:00.250+05:00", "text": "b"},
+        "not-a-record",
+    ]
+    (tmp_path / "usage.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    items = storage.fetch_records(tmp_path, "usage")
+    assert [item["text"] for item in items] == ["a", "b"]
+
+    db_path = storage._record_db_path(tmp_path)
+    with storage._record_db_conn(db_path) as conn:
+        epochs = [row[0] for row in conn.execute("SELECT timestamp_epoch FROM records ORDER BY id")]
+    assert epochs == [1735725600.0, 1735707600.25]
+
+
+def test_append_record_stores_pre_encoded_payload(tmp_path):
+    item = {"timestamp": "2025-01-01T00:00:00Z", "text": "report"}
+    encoded = json.dumps(item).encode("utf-8")
+    storage.append_record(tmp_path, "daily_reports", item, encoded=encoded)
+    assert storage.fetch_records(tmp_path, "daily_reports") == [item]
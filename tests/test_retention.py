@@ -1,7 +1,7 @@
+import os
 from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
-
-import pytz
+from zoneinfo import ZoneInfo
 
 from app import retention, storage
 
@@ -12,6 +12,7 @@ def _write_snapshot(root, dt: datetime):
     path = root / rel_dir / filename
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_bytes(b"test")
+    os.utime(path, (dt.timestamp(), dt.timestamp()))
     return path
 
 
@@ -33,7 +34,8 @@ def test_retention_removes_bundle_and_prunes_records(tmp_path):
         backups_dir=data_dir / "backups",
         retention_days=1,
         retention_min_snapshots=0,
-        tz=pytz.UTC,
+        retention_use_filename_time=False,
+        tz=ZoneInfo("UTC"),
     )
 
     now = datetime.now(timezone.utc)
@@ -71,3 +73,50 @@ def test_retention_removes_bundle_and_prunes_records(tmp_path):
 
     remaining = storage.fetch_records(settings.data_dir, "descriptions")
     assert len(remaining) == 1
+
+
+def test_retention_can_age_by_filename_time(tmp_path):
+    data_dir = tmp_path / "data"
+    settings = SimpleNamespace(
+        data_dir=data_dir,
+        snapshots_dir=data_dir / "snapshots",
+        descriptions_dir=data_dir / "descriptions",
+        compare_10m_dir=data_dir / "compare_10m",
+        compare_hourly_dir=data_dir / "compare_hourly",
+        backups_dir=data_dir / "backups",
+        retention_days=1,
+        retention_min_snapshots=0,
+        retention_use_filename_time=True,
+        tz=ZoneInfo("UTC"),
+    )
+    old_snapshot = _write_snapshot(settings.snapshots_dir, datetime.now(timezone.utc) - timedelta(days=2))
+    # Restored from backup: the file looks new but its path says otherwise.
+    os.utime(old_snapshot, None)
+
+    retention.cleanup(settings)
+
+    assert not old_snapshot.exists()
+
+
+def test_retention_keeps_min_snapshots_of_expired_prefix(tmp_path):
+    data_dir = tmp_path / "data"
+    settings = SimpleNamespace(
+        data_dir=data_dir,
+        snapshots_dir=data_dir / "snapshots",
+        descriptions_dir=data_dir / "descriptions",
+        compare_10m_dir=data_dir / "compare_10m",
+        compare_hourly_dir=data_dir / "compare_hourly",
+        backups_dir=data_dir / "backups",
+        retention_days=1,
+        retention_min_snapshots=2,
+        retention_use_filename_time=False,
+        tz=ZoneInfo("UTC"),
+    )
+    now = datetime.now(timezone.utc)
+    snapshots = [
+        _write_snapshot(settings.snapshots_dir, now - timedelta(days=days)) for days in (4, 3, 2)
+    ]
+
+    retention.cleanup(settings)
+
+    assert [path.exists() for path in snapshots] == [False, True, True]
@@ -0,0 +1,148 @@
+import importlib
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+
+def _load_app(monkeypatch, tmp_path):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("CAMERA_SOURCE", "windows-host")
+    monkeypatch.setenv("API_KEY", "")
+    monkeypatch.setenv("TIMEZONE", "UTC")
+
+    from app import main as main_module
+
+    importlib.reload(main_module)
+    main_module.app.router.on_startup.clear()
+    main_module.app.router.on_shutdown.clear()
+    return main_module
+
+
+def _write_snapshot(root, rel_path: str):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"test")
+    return path
+
+
+def test_latest_snapshot_tracks_enqueued_files(monkeypatch, tmp_path):
+    main_module = _load_app(monkeypatch, tmp_path)
+    client = TestClient(main_module.app)
+
+    _write_snapshot(main_module.settings.snapshots_dir, "2025/01/01/100000.jpg")
+    payload = client.get("/api/snapshots/latest").json()
+    assert payload["snapshot"] == "/data/snapshots/2025/01/01/100000.jpg"
+    assert payload["timestamp"] == "2025-01-01T10:00:00Z"
+
+    newer = _write_snapshot(main_module.settings.snapshots_dir, "2025/01/01/101000.jpg")
+    main_module._enqueue_snapshot(newer)
+    payload = client.get("/api/snapshots/latest").json()
+    assert payload["snapshot"] == "/data/snapshots/2025/01/01/101000.jpg"
+
+
+def test_resolve_snapshot_path_stays_under_snapshots(monkeypatch, tmp_path):
+    main_module = _load_app(monkeypatch, tmp_path)
+    snapshot = _write_snapshot(main_module.settings.snapshots_dir, "2025/01/01/100000.jpg")
+
+    resolved = main_module._resolve_snapshot_path("/data/snapshots/2025/01/01/100000.jpg")
+    assert resolved == snapshot.resolve()
+    assert main_module._resolve_snapshot_path("2025/01/01/100000.jpg") == snapshot.resolve()
+
+    with pytest.raises(HTTPException) as exc_info:
+        main_module._resolve_snapshot_path("/data/snapshots/../records.db")
+    assert exc_info.value.status_code == 400
+
+
+def test_list_snapshot_files_walks_tree_in_mtime_order(tmp_path):
+    import os
+
+    from app import storage
+
+    root = tmp_path / "snapshots"
+    newer = _write_snapshot(root, "2025/01/02/090000.png")
+    older = _write_snapshot(root, "2025/01/01/090000.JPG")
+    _write_snapshot(root, "2025/01/01/090500.jpg.tmp")
+    _write_snapshot(root, "2025/01/01/notes.txt")
+    os.utime(older, (1_000, 1_000))
+    os.utime(newer, (2_000, 2_000))
+
+    assert storage.list_snapshot_files(root) == [older, newer]
+
+
+def test_list_snapshot_files_reuses_cache_while_dirs_are_unchanged(tmp_path, monkeypatch):
+    import os
+
+    from app import storage
+
+    root = tmp_path / "snapshots"
+    first = _write_snapshot(root, "2025/01/01/090000.jpg")
+    for directory in (root, root / "2025", root / "2025/01", root / "2025/01/01"):
+        os.utime(directory, (1_000, 1_000))
+    assert storage.list_snapshot_files(root) == [first]
+
+    monkeypatch.setattr(storage, "_snapshot_cache_ts", 0.0)
+    walks = []
+    original_walk = storage._scan_snapshot_tree
+    monkeypatch.setattr(
+        storage,
+        "_scan_snapshot_tree",
+        lambda *args: walks.append(args) or original_walk(*args),
+    )
+    assert storage.list_snapshot_files(root) == [first]
+    assert walks == []
+
+    second = _write_snapshot(root, "2025/01/01/091000.jpg")
+    monkeypatch.setattr(storage, "_snapshot_cache_ts", 0.0)
+    assert set(storage.list_snapshot_files(root)) == {first, second}
+    assert len(walks) == 1
+
+
+def test_list_snapshot_files_sorts_without_path_stat(tmp_path, monkeypatch):
+    import os
+    from pathlib import Path
+
+    from app import storage
+
+    root = tmp_path / "snapshots"
+    later = _write_snapshot(root, "2025/01/01/090500.jpg")
+    earlier = _write_snapshot(root, "2025/01/01/090000.jpg")
+    os.utime(earlier, (1_000, 1_000))
+    os.utime(later, (2_000, 2_000))
+
+    def fail_stat(self, *args, **kwargs):
+        raise AssertionError("list_snapshot_files should reuse scandir stats")
+
+    monkeypatch.setattr(Path, "stat", fail_stat)
+    assert storage.list_snapshot_files_with_mtime(root) == [(1_000, earlier), (2_000, later)]
+
+
+def test_list_snapshot_files_restores_saved_index_on_cold_start(tmp_path, monkeypatch):
+    import os
+
+    from app import storage
+
+    root = tmp_path / "snapshots"
+    first = _write_snapshot(root, "2025/01/01/090000.jpg")
+    for directory in (root, root / "2025", root / "2025/01", root / "2025/01/01"):
+        os.utime(directory, (1_000, 1_000))
+    assert storage.list_snapshot_files(root) == [first]
+    assert (tmp_path / ".snapshots_index.json").exists()
+
+    monkeypatch.setattr(storage, "_snapshot_cache_root", None)
+    walks = []
+    original_walk = storage._scan_snapshot_tree
+    monkeypatch.setattr(
+        storage,
+        "_scan_snapshot_tree",
+        lambda *args: walks.append(args) or original_walk(*args),
+    )
+    assert storage.list_snapshot_files(root) == [first]
+    assert walks == []
+
+    second = _write_snapshot(root, "2025/01/01/091000.jpg")
+    monkeypatch.setattr(storage, "_snapshot_cache_root", None)
+    assert set(storage.list_snapshot_files(root)) == {first, second}
+    assert len(walks) == 1
@@ -1,4 +1,10 @@
-﻿from app import storage
+﻿import errno
+import os
+from pathlib import Path
+
+import pytest
+
+from app import storage
 
 
 def test_atomic_write_json(tmp_path):
@@ -12,5 +18,231 @@ def test_append_json_list(tmp_path):
     path = tmp_path / "list.json"
     storage.append_json_list(path, {"a": 1})
     storage.append_json_list(path, {"b": 2})
-    data = storage.read_json(path, [])
+    data = storage.read_json_list(path)
     assert len(data) == 2
+
+
+def test_append_json_list_routes_record_lists_to_sqlite(tmp_path):
+    storage.append_json_list(tmp_path / "usage.json", {"ts": "2025-01-01T00:00:00Z", "n": 1})
+    assert not (tmp_path / "usage.json").exists()
+    assert storage.fetch_records(tmp_path, "usage") == [{"ts": "2025-01-01T00:00:00Z", "n": 1}]
+
+
+def test_write_last_processed_is_compact(tmp_path):
+    path = tmp_path / "last_processed.json"
+    storage.write_last_processed(path, {"path": "a.jpg", "timestamp": "2025-01-01T00:00:00Z"})
+    assert path.read_text(encoding="utf-8") == '{"path":"a.jpg","timestamp":"2025-01-01T00:00:00Z"}'
+    assert storage.read_last_processed(path)["path"] == "a.jpg"
+
+
+def test_file_lock_serialises_threads(tmp_path):
+    import threading
+
+    path = tmp_path / "list.json"
+    threads = [
+        threading.Thread(target=storage.append_json_list, args=(path, {"i": index}))
+        for index in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert len(storage.read_json(path, [])) == 8
+
+
+def test_append_json_list_patches_existing_array_in_place(tmp_path):
+    path = tmp_path / "list.json"
+    storage.atomic_write_json(path, [{"a": 1}])
+    storage.append_json_list(path, {"b": 2})
+    assert storage.read_json(path, None) == [{"a": 1}, {"b": 2}]
+
+    empty = tmp_path / "empty.json"
+    empty.write_text("[]\n", encoding="utf-8")
+    storage.append_json_list(empty, {"c": 3})
+    assert storage.read_json(empty, None) == [{"c": 3}]
+
+    not_list = tmp_path / "object.json"
+    storage.atomic_write_json(not_list, {"x": 1})
+    storage.append_json_list(not_list, {"d": 4})
+    assert storage.read_json(not_list, None) == [{"d": 4}]
+    assert storage.read_json(tmp_path / "object.json.corrupt", None) == {"x": 1}
+
+
+def test_append_json_list_recovers_after_torn_append(tmp_path, monkeypatch):
+    path = tmp_path / "list.json"
+    storage.append_json_list(path, {"i": 0})
+    storage.append_json_list(path, {"i": 1})
+    # Crash after the new items landed past the old "]" but before the "," did.
+    path.write_bytes(path.read_bytes() + b'{"i":2}]')
+    monkeypatch.setattr(storage, "_json_lists_verified", set())
+    storage.append_json_list(path, {"i": 3})
+    assert storage.read_json(path, None) == [{"i": 0}, {"i": 1}, {"i": 3}]
+
+
+def test_append_json_list_never_overwrites_unreadable_list(tmp_path, monkeypatch):
+    path = tmp_path / "list.json"
+    torn = b'[{"i":0},{"i":1},{"i":2'
+    path.write_bytes(torn)
+    monkeypatch.setattr(storage, "_json_lists_verified", set())
+    storage.append_json_list(path, {"i": 4})
+    assert storage.read_json(path, None) == [{"i": 4}]
+    assert (tmp_path / "list.json.corrupt").read_bytes() == torn
+
+
+def test_atomic_write_recreates_directory_removed_behind_cache(tmp_path):
+    import shutil
+
+    path = tmp_path / "nested" / "value.json"
+    storage.atomic_write_json(path, {"n": 1})
+    shutil.rmtree(path.parent)
+    storage.atomic_write_json(path, {"n": 2})
+    assert storage.read_json(path, {}) == {"n": 2}
+
+
+def test_schema_version_written_once(tmp_path):
+    assert storage.read_schema_version(tmp_path / "data") is None
+    storage.write_schema_version(tmp_path / "data", "1")
+    storage.write_schema_version(tmp_path / "data", "2")
+    assert storage.read_schema_version(tmp_path / "data") == "1"
+    assert [entry.name for entry in (tmp_path / "data").iterdir()] == ["schema_version.txt"]
+
+
+def test_schema_version_is_synced_before_it_appears(tmp_path, monkeypatch):
+    seen = []
+    original_link = storage.os.link
+
+    def link(src, dst, **kwargs):
+        seen.append(Path(src).read_text(encoding="utf-8"))
+        return original_link(src, dst, **kwargs)
+
+    monkeypatch.setattr(storage.os, "link", link)
+    storage.write_schema_version(tmp_path, "3")
+    assert seen == ["3"]
+    assert storage.read_schema_version(tmp_path) == "3"
+
+
+def test_schema_version_present_costs_only_a_read(tmp_path, monkeypatch):
+    storage.write_schema_version(tmp_path, "1")
+    monkeypatch.setattr(storage.os, "open", lambda *args, **kwargs: pytest.fail("opened"))
+    storage.write_schema_version(tmp_path, "2")
+    assert storage.read_schema_version(tmp_path) == "1"
+
+
+def test_schema_version_replaces_empty_leftover(tmp_path):
+    (tmp_path / "schema_version.txt").write_text("", encoding="utf-8")
+    storage.write_schema_version(tmp_path, "4")
+    assert storage.read_schema_version(tmp_path) == "4"
+
+
+def test_schema_version_falls_back_when_links_are_refused(tmp_path, monkeypatch):
+    def refuse(src, dst, **kwargs):
+        raise PermissionError(errno.EPERM, "hard links not supported")
+
+    monkeypatch.setattr(storage.os, "link", refuse)
+    storage.write_schema_version(tmp_path, "5")
+    assert storage.read_schema_version(tmp_path) == "5"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["schema_version.txt"]
+
+
+def test_read_json_reuses_decoded_value_until_file_changes(tmp_path):
+    path = tmp_path / "cached.json"
+    storage.atomic_write_json(path, {"n": 1})
+    first = storage.read_json(path, {})
+    assert storage.read_json(path, {}) is first
+
+    storage.atomic_write_json(path, {"n": 22})
+    assert storage.read_json(path, {}) == {"n": 22}
+
+
+def test_read_json_notices_replace_with_same_mtime_and_size(tmp_path):
+    path = tmp_path / "cached.json"
+    storage.atomic_write_json(path, {"n": 1})
+    before = path.stat()
+    assert storage.read_json(path, {}) == {"n": 1}
+
+    storage.atomic_write_json(path, {"n": 2})
+    os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+    assert path.stat().st_size == before.st_size
+    assert storage.read_json(path, {}) == {"n": 2}
+
+
+def test_read_json_list_returns_a_copy(tmp_path):
+    path = tmp_path / "list.json"
+    storage.append_json_list(path, {"a": 1})
+    storage.read_json_list(path).append({"b": 2})
+    assert storage.read_json_list(path) == [{"a": 1}]
+
+
+def test_write_json_list_validates_generators_without_consuming_them(tmp_path):
+    path = tmp_path / "list.json"
+    seen = []
+    storage.write_json_list(path, ({"i": i} for i in range(3)), seen.append)
+    assert len(seen) == 3
+    assert storage.read_json(path, None) == [{"i": 0}, {"i": 1}, {"i": 2}]
+
+
+def test_large_durable_write_is_synced_in_slices(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(storage.os, "fdatasync", synced.append, raising=False)
+    monkeypatch.setattr(storage, "_CHUNKED_SYNC_THRESHOLD_BYTES", 16)
+    monkeypatch.setattr(storage, "_CHUNKED_SYNC_SLICE_BYTES", 8)
+    path = tmp_path / "big.json"
+    storage.write_json_list(path, [{"value": "x" * 20}])
+    assert len(synced) > 1
+    assert storage.read_json(path, None) == [{"value": "x" * 20}]
+
+
+def test_extend_json_list_appends_batch(tmp_path):
+    path = tmp_path / "list.json"
+    storage.extend_json_list(path, [{"a": 1}, {"b": 2}])
+    storage.extend_json_list(path, ({"c": i} for i in range(2)))
+    storage.extend_json_list(path, [])
+    assert storage.read_json_list(path) == [{"a": 1}, {"b": 2}, {"c": 0}, {"c": 1}]
+
+
+def test_directory_fsync_only_for_durable_writes(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(storage, "_fsync_dir", synced.append)
+    storage.atomic_write_json(tmp_path / "fast.json", {}, durable=False)
+    storage.append_json_list(tmp_path / "list.json", {"a": 1})
+    assert synced == []
+    storage.atomic_write_json(tmp_path / "safe.json", {})
+    assert synced == [tmp_path]
+
+
+def test_atomic_write_uses_named_temp_when_unnamed_is_unavailable(tmp_path, monkeypatch):
+    path = tmp_path / "value.json"
+    storage.atomic_write_json(path, {"n": 1})
+    monkeypatch.setattr(storage, "_open_unnamed_tmp", lambda directory: None)
+    storage.atomic_write_json(path, {"n": 2})
+    assert storage.read_json(path, {}) == {"n": 2}
+    assert [entry.name for entry in tmp_path.iterdir()] == ["value.json"]
+
+
+def test_atomic_write_falls_back_when_unnamed_link_is_refused(tmp_path, monkeypatch):
+    import errno
+
+    import pytest
+
+    if not storage._O_TMPFILE:
+        pytest.skip("O_TMPFILE not available")
+
+    def refuse(fd, tmp_path):
+        raise OSError(errno.EXDEV, "refused", f"/proc/self/fd/{fd}")
+
+    monkeypatch.setattr(storage, "_link_unnamed_tmp", refuse)
+    monkeypatch.setattr(storage, "_tmpfile_unsupported_dirs", set())
+    path = tmp_path / "value.json"
+    storage.atomic_write_json(path, {"n": 1})
+    assert storage.read_json(path, {}) == {"n": 1}
+    assert storage._tmpfile_unsupported_dirs == {str(tmp_path)}
+
+
+def test_durable_write_syncs_file_data_once(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(storage, "_sync_file_data", synced.append)
+    storage.atomic_write_json(tmp_path / "fast.json", {}, durable=False)
+    assert synced == []
+    storage.atomic_write_json(tmp_path / "safe.json", {"n": 1})
+    assert len(synced) == 1
+    assert storage.read_json(tmp_path / "safe.json", {}) == {"n": 1}
@@ -1,4 +1,14 @@
-﻿from app.tasks import safe_truncate
+﻿import re
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app import tasks
+from app.tasks import _parse_snapshot_time, safe_truncate
 
 
 def test_safe_truncate_short():
@@ -10,3 +20,366 @@ def test_safe_truncate_long():
     text = "One sentence. Two sentence. Three sentence. Four sentence."
     result = safe_truncate(text, 20)
     assert len(result) <= 20
+
+
+def test_parse_snapshot_time():
+    settings = SimpleNamespace(tz=ZoneInfo("America/New_York"))
+    path = Path("data/snapshots/2025/01/15/083000.jpg")
+    assert _parse_snapshot_time(path, settings) == datetime(2025, 1, 15, 13, 30, tzinfo=timezone.utc)
+    assert _parse_snapshot_time(Path("083000.jpg"), settings) is None
+    assert _parse_snapshot_time(Path("data/snapshots/2025/01/15/bad.jpg"), settings) is None
+
+
+def test_encode_image_matches_base64_across_chunks(tmp_path, monkeypatch):
+    import base64
+
+    monkeypatch.setattr(tasks, "_BASE64_CHUNK_BYTES", 6)
+    for size in (0, 1, 5, 6, 7, 20):
+        path = tmp_path / f"{size}.png"
+        raw = bytes(range(size))
+        path.write_bytes(raw)
+        expected = base64.b64encode(raw).decode("ascii")
+        assert tasks.encode_image(path) == ("image/png", expected)
+        assert tasks.encode_image_data_url(path) == f"data:image/png;base64,{expected}"
+
+
+def test_encode_image_reuses_encoding_until_file_changes(tmp_path, monkeypatch):
+    import os
+
+    monkeypatch.setattr(tasks, "_image_cache", tasks.OrderedDict())
+    monkeypatch.setattr(tasks, "_image_cache_chars", 0)
+    encodes = []
+    original = tasks._encode_base64_file
+    monkeypatch.setattr(tasks, "_encode_base64_file", lambda path: encodes.append(path) or original(path))
+    path = tmp_path / "frame.jpg"
+    path.write_bytes(b"abc")
+    assert tasks.encode_image(path) == ("image/jpeg", "YWJj")
+    assert tasks.encode_image_data_url(path) == "data:image/jpeg;base64,YWJj"
+    assert len(encodes) == 1
+
+    path.write_bytes(b"abcd")
+    os.utime(path, ns=(1, 1))
+    assert tasks.encode_image(path) == ("image/jpeg", "YWJjZA==")
+    assert len(encodes) == 2
+
+
+def test_task_runner_reuses_long_lived_clients(tmp_path):
+    import httpx
+
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, content=b"jpeg")
+
+    settings = SimpleNamespace(
+        groq_rate_limit_rpm=60,
+        gemini_rate_limit_rpm=60,
+        api_retry_max_attempts=1,
+        api_retry_base_delay=0.0,
+        api_circuit_breaker_threshold=5,
+        groq_api_key="secret",
+        google_api_key="k",
+        camera_http_url="http://camera/snapshot.jpg",
+    )
+    runner = tasks.TaskRunner(settings, SimpleNamespace())
+    client = runner._camera_client
+    client._transport = httpx.MockTransport(handler)
+    assert runner._capture_http(tmp_path / "a.jpg") == tmp_path / "a.jpg"
+    assert runner._capture_http(tmp_path / "b.jpg") == tmp_path / "b.jpg"
+    assert runner._camera_client is client
+    assert len(calls) == 2
+    assert (tmp_path / "b.jpg").read_bytes() == b"jpeg"
+
+    request = runner._groq_client.build_request("POST", "/chat/completions")
+    assert str(request.url) == f"{tasks.GROQ_BASE_URL}/chat/completions"
+    assert request.headers["Authorization"] == "Bearer secret"
+    runner.close()
+
+
+def test_post_json_sends_orjson_body():
+    import httpx
+
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={})
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        tasks._post_json(client, "http://api/x", {"image": "YWJj", "n": 1}, 5)
+    assert seen[0].headers["Content-Type"] == "application/json"
+    assert seen[0].content == b'{"image":"YWJj","n":1}'
+
+
+def test_response_json_decodes_raw_body():
+    import httpx
+
+    resp = httpx.Response(200, content='{"text": "caf\u00e9", "n": 1}'.encode())
+    assert tasks._response_json(resp) == {"text": "café", "n": 1}
+    with pytest.raises(ValueError):
+        tasks._response_json(httpx.Response(502, content=b"<html>"))
+
+
+def test_normalize_tags_dedupes_in_first_seen_order():
+    data = {"people": [" Man ", "woman", "man", 3, ""], "vehicles": "Car", "objects": None}
+    assert tasks._normalize_tags(data) == {
+        "people": ["man", "woman"],
+        "vehicles": ["car"],
+        "objects": [],
+    }
+
+
+def test_snapshot_batch_overlaps_tags_with_next_description(tmp_path, monkeypatch):
+    import threading
+
+    settings = SimpleNamespace(
+        groq_rate_limit_rpm=60,
+        gemini_rate_limit_rpm=60,
+        api_retry_max_attempts=1,
+        api_retry_base_delay=0.0,
+        api_circuit_breaker_threshold=5,
+        groq_api_key="k",
+        google_api_key="k",
+        run_dir=tmp_path / "run",
+        camera_source="rtsp",
+        dark_frame_check=False,
+        motion_detection_enabled=False,
+    )
+    metrics = SimpleNamespace(record_snapshot=lambda ts: None)
+    runner = tasks.TaskRunner(settings, metrics)
+    # Self-captured snapshots skip the stability poll entirely.
+    monkeypatch.setattr(tasks, "ensure_stable_file", lambda *args, **kwargs: pytest.fail("polled"))
+    monkeypatch.setattr(tasks, "validate_image", lambda path, settings, size: (True, ""))
+
+    second_described = threading.Event()
+    written = []
+    paths = [tmp_path / "a.jpg", tmp_path / "b.jpg"]
+    for path in paths:
+        path.write_bytes(b"x")
+
+    def describe(path, snapshot_ts):
+        if path == paths[1]:
+            second_described.set()
+        return path.name, 0.0, {}
+
+    def extract_tags(text, snapshot_ts):
+        # Only returns once the next description has started in parallel.
+        assert second_described.wait(timeout=5)
+        return {}
+
+    monkeypatch.setattr(runner, "_describe_with_groq", describe)
+    monkeypatch.setattr(runner, "_extract_tags", extract_tags)
+    def write_description(path, *args):
+        written.append(path)
+        future = Future()
+        future.set_result(None)
+        return future
+
+    monkeypatch.setattr(runner, "_write_description", write_description)
+    runner.process_snapshot_batch(paths)
+    runner.close()
+
+    assert written == paths
+    assert runner.last_processed_path == paths[1]
+
+
+def test_finish_snapshot_leaves_snapshot_unprocessed_when_row_is_lost(monkeypatch):
+    lost = Future()
+    lost.set_exception(RuntimeError("write failed"))
+    marked = []
+    runner = SimpleNamespace(
+        settings=SimpleNamespace(),
+        _extract_tags=lambda text, snapshot_ts: {},
+        _write_description=lambda *args: lost,
+        _mark_processed=lambda path, ts: marked.append(path),
+    )
+    with pytest.raises(RuntimeError):
+        tasks.TaskRunner._finish_snapshot(runner, Path("a.jpg"), "2025-01-15T12:00:00Z", "text", 1.0, {})
+    assert marked == []
+
+
+def test_extract_json_object_stops_at_first_balanced_object():
+    text = 'Sure: {"summary": "a {brace} and \\"quote\\"", "n": 1} then {"other": 2}'
+    assert tasks._extract_json_object(text) == {"summary": 'a {brace} and "quote"', "n": 1}
+    assert tasks._extract_json_object('```json\n{"a": [1, 2]}\n```') == {"a": [1, 2]}
+    assert tasks._extract_json_object("no json here") is None
+    assert tasks._extract_json_object("{broken") is None
+
+
+def test_window_snapshots_stops_at_old_mtimes(monkeypatch):
+    settings = SimpleNamespace(tz=timezone.utc)
+    end = datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc)
+    entries = [
+        (end.timestamp() - 3 * 3600, Path("2025/01/15/090000.jpg")),
+        (end.timestamp() - 300, Path("2025/01/15/115500.jpg")),
+        (end.timestamp() - 120, Path("2025/01/15/115800.jpg")),
+        (end.timestamp(), Path("2025/01/15/120000.jpg")),
+    ]
+    parsed = []
+    original = tasks._parse_snapshot_time
+    monkeypatch.setattr(
+        tasks, "_parse_snapshot_time", lambda path, s: parsed.append(path) or original(path, s)
+    )
+    window = tasks._window_snapshots(entries, end, minutes=10, settings=settings, max_images=10)
+    assert window == [path for _, path in entries[1:]]
+    assert Path("2025/01/15/090000.jpg") not in parsed
+    assert tasks._window_snapshots(entries, end, minutes=10, settings=settings, max_images=2) == [
+        path for _, path in entries[2:]
+    ]
+
+
+def test_build_ask_context_keeps_newest_items_in_order():
+    settings = SimpleNamespace(tz=timezone.utc)
+    items = [
+        {"timestamp": "2025-01-01T10:05:00+00:00", "text": "Second."},
+        {"timestamp": None, "text": "Undated."},
+        {"timestamp": "2025-01-01T10:00:00+00:00", "text": "First."},
+        {"timestamp": "2025-01-01T10:10:00+00:00", "text": "Third."},
+    ]
+    context, count, window, _ = tasks._build_ask_context(items, settings, max_items=2)
+    assert context == "- 2025-01-01 10:05: Second.\n- 2025-01-01 10:10: Third."
+    assert count == 2
+    assert window == "2025-01-01 10:05 - 10:10"
+
+
+def test_ensure_stable_file_uses_known_first_size(tmp_path, monkeypatch):
+    path = tmp_path / "frame.jpg"
+    path.write_bytes(b"abcd")
+    sleeps = []
+    monkeypatch.setattr(tasks.time, "sleep", sleeps.append)
+    assert tasks.ensure_stable_file(path, size=4)
+    assert sleeps == [0.5]
+    assert not tasks.ensure_stable_file(path, attempts=1, size=4)
+    assert sleeps == [0.5]
+    assert not tasks.ensure_stable_file(tmp_path / "missing.jpg")
+
+
+def test_aggregate_tags_counts_per_category():
+    items = [
+        {"tags": {"people": ["Man", " man "], "vehicles": ["car"]}},
+        {"tags": {"people": ["woman", "", 3], "objects": None}},
+        {"tags": {"vehicles": [["nested"], "Car"]}},
+        {"tags": None},
+        {},
+    ]
+    assert tasks._aggregate_tags(items) == {
+        "people": [("man", 2), ("woman", 1)],
+        "vehicles": [("car", 2)],
+        "objects": [],
+    }
+
+
+def test_parse_iso_is_memoized():
+    first = tasks._parse_iso("2025-01-01T10:00:00Z")
+    assert first == datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    assert tasks._parse_iso("2025-01-01T10:00:00Z") is first
+    assert tasks._parse_iso("not a date") is None
+    assert tasks._parse_iso(None) is None
+
+
+def test_format_tags_summary():
+    tags = {"people": [("man", 2), ("woman", 1)], "vehicles": [], "objects": [("bag", 1)]}
+    assert tasks._format_tags_summary(tags) == "people: man(2), woman(1); objects: bag(1)"
+    assert tasks._format_tags_summary({"people": []}) == "none"
+
+
+def test_motion_skipped_batch_does_not_take_processing_lock(tmp_path, monkeypatch):
+    settings = SimpleNamespace(
+        groq_rate_limit_rpm=60,
+        gemini_rate_limit_rpm=60,
+        api_retry_max_attempts=1,
+        api_retry_base_delay=0.0,
+        api_circuit_breaker_threshold=5,
+        groq_api_key="k",
+        google_api_key="k",
+        run_dir=tmp_path / "run",
+        camera_source="http",
+        dark_frame_check=False,
+        motion_detection_enabled=True,
+        motion_detection_threshold=5.0,
+    )
+    runner = tasks.TaskRunner(settings, SimpleNamespace(record_snapshot=lambda ts: None))
+    runner.last_seen_path = tmp_path / "previous.jpg"
+    paths = [tmp_path / "a.jpg", tmp_path / "b.jpg"]
+    for path in paths:
+        path.write_bytes(b"x")
+    monkeypatch.setattr(tasks, "validate_image", lambda path, settings, size: (True, ""))
+    monkeypatch.setattr(tasks, "diff_percent", lambda a, b: 0.0)
+    monkeypatch.setattr(tasks.storage, "file_lock", lambda *args, **kwargs: pytest.fail("locked"))
+    runner.process_snapshot_batch(paths)
+    runner.close()
+    assert runner.last_processed_path == paths[1]
+
+
+def test_compare_sequence_skips_near_duplicate_frames(tmp_path, monkeypatch):
+    runner = SimpleNamespace(settings=SimpleNamespace(compare_phash_threshold=5))
+    hashes = {"a.jpg": 0b1111, "b.jpg": 0b1110, "c.jpg": 0b11110000}
+    monkeypatch.setattr(tasks, "image_hash", lambda path: hashes[path.name])
+    frames = tasks.TaskRunner._frames_look_identical
+    assert frames(runner, [tmp_path / "a.jpg", tmp_path / "b.jpg"])
+    assert not frames(runner, [tmp_path / "a.jpg", tmp_path / "c.jpg"])
+    runner.settings.compare_phash_threshold = 1
+    assert frames(runner, [tmp_path / "a.jpg", tmp_path / "b.jpg"])
+    runner.settings.compare_phash_threshold = 0
+    assert not frames(runner, [tmp_path / "a.jpg", tmp_path / "b.jpg"])
+
+
+def test_window_snapshots_bisects_to_window_inside_listing():
+    settings = SimpleNamespace(tz=timezone.utc)
+    end = datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc)
+    entries = [
+        (end.timestamp() - 300, Path("2025/01/15/115500.jpg")),
+        (end.timestamp(), Path("2025/01/15/120000.jpg")),
+        (end.timestamp() + 2 * 3600, Path("2025/01/15/140000.jpg")),
+    ]
+    window = tasks._window_snapshots(entries, end, minutes=10, settings=settings, max_images=10)
+    assert window == [path for _, path in entries[:2]]
+
+
+def test_now_utc_iso_is_canonical_z_form():
+    value = tasks.now_utc_iso()
+    assert re.fullmatch(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z", value)
+    assert abs(datetime.fromisoformat(value) - datetime.now(timezone.utc)) < timedelta(seconds=5)
+
+
+def test_snapshot_label_formats_local_time():
+    settings = SimpleNamespace(tz=ZoneInfo("America/New_York"))
+    path = Path("data/snapshots/2025/01/15/120000.jpg")
+    assert tasks._snapshot_label(path, settings) == "2025-01-15 12:00:00 EST"
+    assert tasks._snapshot_label(Path("data/snapshots/2025/01/15/bad.jpg"), settings) == "bad.jpg"
+    assert tasks._snapshot_label(Path("short.jpg"), settings) == "short.jpg"
+
+
+def test_extract_gemini_text_joins_text_parts():
+    payload = {
+        "candidates": [
+            {"content": {"parts": [{"text": " A car "}, {"inlineData": {}}, {"text": "leaves."}]}}
+        ]
+    }
+    assert tasks._extract_gemini_text(payload) == "A car  leaves."
+    assert tasks._extract_gemini_text({"candidates": []}) == ""
+    assert tasks._extract_gemini_text({"candidates": [{}]}) == ""
+
+
+def test_parse_daily_response_drops_blank_highlights():
+    text = '{"summary": " Quiet day. ", "highlights": [" Car arrived ", "", "  ", 7]}'
+    assert tasks._parse_daily_response(text) == ("Quiet day.", ["Car arrived", "7"])
+
+
+def test_write_description_skips_fsync_for_audit_copy(tmp_path, monkeypatch):
+    settings = SimpleNamespace(
+        data_dir=tmp_path,
+        snapshots_dir=tmp_path / "snapshots",
+        descriptions_dir=tmp_path / "descriptions",
+        groq_model="m",
+    )
+    writes = []
+    monkeypatch.setattr(
+        tasks.storage, "atomic_write_json", lambda path, data, **kwargs: writes.append(kwargs)
+    )
+    monkeypatch.setattr(tasks.storage, "append_record", lambda *args, **kwargs: None)
+    runner = SimpleNamespace(settings=settings)
+    path = settings.snapshots_dir / "2025/01/15/120000.jpg"
+    tasks.TaskRunner._write_description(runner, path, "2025-01-15T12:00:00Z", "text", 1.0, {})
+    assert writes == [{"durable": False}]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app import storage, usage
+
+
+def _iso(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _seed(data_dir):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    rows = [
+        (now - timedelta(days=1), "groq", 100, 20, 0.5),
+        (now - timedelta(days=1), "gemini", 300, 40, 1.25),
+        (now, "groq", 10, 2, 0.25),
+        (now - timedelta(days=30), "groq", 999, 999, 9.0),
+    ]
+    for ts, provider, input_tokens, output_tokens, cost in rows:
+        record = {
+            "timestamp": _iso(ts),
+            "provider": provider,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cost_usd": cost,
+        }
+        storage.append_record(data_dir, "usage", record)
+
+
+def test_summarize_usage_groups_in_sqlite(tmp_path, monkeypatch):
+    _seed(tmp_path)
+    settings = SimpleNamespace(data_dir=tmp_path)
+    summary = usage.summarize_usage(settings, days=7)
+    assert summary["totals"] == {
+        "input_tokens": 410,
+        "output_tokens": 62,
+        "total_tokens": 472,
+        "cost_usd": 2.0,
+    }
+    assert summary["by_provider"]["groq"]["input_tokens"] == 110
+    assert summary["by_provider"]["gemini"]["cost_usd"] == 1.25
+    assert len(summary["by_day"]) == 2
+
+    monkeypatch.setattr(storage, "usage_totals_since", lambda data_dir, cutoff: None)
+    assert usage.summarize_usage(settings, days=7) == summary
+
+
+def test_calculate_cost_uses_per_provider_rates():
+    settings = SimpleNamespace(
+        groq_cost_input_million=2.0,
+        groq_cost_output_million=4.0,
+        gemini_cost_input_million=1.0,
+        gemini_cost_output_million=0.0,
+    )
+    assert usage._calculate_cost(settings, "groq", 500_000, 250_000) == 2.0
+    assert usage._calculate_cost(settings, "gemini", 1_000_000, 10) == 1.0
+    assert usage._calculate_cost(settings, "other", 1_000_000, 1_000_000) == 0.0
+
+
+def test_group_usage_records_keys_days_in_utc():
+    records = [
+        {"timestamp": "2025-01-15T23:30:00-05:00", "provider": "groq", "input_tokens": 1},
+        {"timestamp": "2025-01-16T08:00:00Z", "provider": "groq", "input_tokens": 2},
+        {"timestamp": "bad", "provider": "groq"},
+    ]
+    rows = usage._group_usage_records(records)
+    assert rows == [("groq", "2025-01-16", 3.0, 0.0, 0.0, 0.0)]
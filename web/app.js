@@ -162,7 +162,7 @@ async function fetchJson(url, options = {}, allowRetry = true) {
   if (apiKey) {
     headers.set("X-API-Key", apiKey);
   }
-  const response = await fetch(url, { cache: "no-store", ...options, headers });
+  const response = await fetch(url, { cache: "no-cache", ...options, headers });
   if (response.status === 401 && allowRetry) {
     const currentKey = getApiKey();
     if (currentKey && Date.now() - apiKeyLastUpdated < 5000) {